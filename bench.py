@@ -0,0 +1,168 @@
+import argparse
+import contextlib
+import json
+import time
+import numpy as np
+from crc import decodeCrcSoft
+from sender import Sender
+from receiver import Receiver
+from capture import ArraySource
+from channel import Channel
+from framing import CODES
+
+class StageTimer:
+    """
+    Accumulates wall clock and CPU time per named stage.
+    """
+
+    def __init__(self):
+        self.wall = {}
+        self.cpu = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.wall[name] = self.wall.get(name, 0.0) + time.perf_counter() - wall
+            self.cpu[name] = self.cpu.get(name, 0.0) + time.process_time() - cpu
+
+def run_trial(sender: Sender, receiver: Receiver, channel: Channel, message: list[int], timer: StageTimer, sample_rate: int = 44100, duration: float = 0.3, lead: float = 0.5, soft: bool = False, code: str = "crc"):
+    """
+    Send one message through the channel and decode it.
+
+    Parameters:
+        sender (Sender): Sender synthesizing the transmission
+        receiver (Receiver): Calibrated receiver decoding it
+        channel (Channel): Channel between the two
+        message (list[int]): Bits of the message
+        timer (StageTimer): Timer accumulating the time spent in every stage
+        sample_rate (int): Sampling rate in Hz
+        duration (float): Duration of each symbol in seconds
+        lead (float): Seconds of silence before and after the transmission
+        soft (bool): Whether to decode the CRC with the bit reliabilities (decodeCrcSoft)
+        code (str): Error correcting code of the message, a key of framing.CODES
+
+    Returns:
+        decoded (list[int]): The decoded message, None if the reception failed
+        symbols (int): Number of symbols of the transmission
+        airtime (float): Duration of the transmission in seconds
+    """
+    bits = len(message)
+    with timer.stage("synthesis"):
+        encoding = CODES[code][0](message)
+        symbols = sender.change_base([(bits>>i) & 1 for i in range(4, -1, -1)] + encoding, sender.base)
+        audio_signal = sender.synthesize(symbols, sample_rate, duration)
+    silence = np.zeros(int(lead*sample_rate), dtype=np.float32)
+    with timer.stage("channel"):
+        received = channel.apply(np.concatenate((silence, audio_signal, silence)), sample_rate)
+
+    decoded = None
+    try:
+        with timer.stage("detection"):
+            length, transmission, reliability = receiver.decode_audio_to_bits(sample_rate, duration, source=ArraySource(received, sample_rate), soft=True, code=code)
+        with timer.stage("crc"):
+            if soft and code == "crc":
+                decoded = decodeCrcSoft(transmission = transmission, reliability = reliability, bits = length)
+            else:
+                decoded = CODES[code][1](transmission, length)
+    except (AssertionError, EOFError):
+        pass
+    return decoded, len(symbols), len(audio_signal)/sample_rate
+
+def run_config(base: int, duration: float, bits: int, channel_args: dict, trials: int = 5, sample_rate: int = 44100, seed: int = 0, separator: bool = True, subbands: int = 1, aligned: bool = False, soft: bool = False, code: str = "crc")-> dict:
+    """
+    Run several trials of one configuration and summarise them.
+
+    Parameters:
+        base (int): Number of data tones of the sender and the receiver
+        duration (float): Duration of each symbol in seconds
+        bits (int): Length of the random messages
+        channel_args (dict): Keyword arguments of the Channel
+        trials (int): Number of messages to send
+        sample_rate (int): Sampling rate in Hz
+        seed (int): Seed of the messages and of the channel noise
+        separator (bool): Whether symbols are followed by the separator tone
+        subbands (int): Number of tones sent at once, one per subband of base tones
+        aligned (bool): Whether the receiver uses correlation sync and aligned symbol windows
+        soft (bool): Whether the CRC is decoded with the bit reliabilities
+        code (str): Error correcting code of the messages, a key of framing.CODES
+
+    Returns:
+        dict: Machine readable results of the configuration
+    """
+    rng = np.random.default_rng(seed)
+    channel = Channel(seed = seed, **channel_args)
+    sender, receiver = Sender(base, separator, subbands), Receiver(base, separator, subbands, aligned)
+    timer = StageTimer()
+    with timer.stage("calibration"):
+        receiver.calibrate(sample_rate, source=ArraySource(channel.apply(np.zeros(int(2*sample_rate)), sample_rate), sample_rate))
+
+    frame_errors, bit_errors, decoded_bits, delivered_bits, airtime, symbols = 0, 0, 0, 0, 0.0, 0
+    for _ in range(trials):
+        message = [int(bit) for bit in rng.integers(0, 2, bits)]
+        decoded, trial_symbols, trial_airtime = run_trial(sender, receiver, channel, message, timer, sample_rate, duration, soft = soft, code = code)
+        symbols += trial_symbols
+        airtime += trial_airtime
+        if decoded is None:
+            frame_errors += 1
+            continue
+        errors = sum(a != b for a, b in zip(message, decoded)) + abs(len(message) - len(decoded))
+        bit_errors += errors
+        decoded_bits += len(message)
+        frame_errors += errors > 0
+        delivered_bits += len(message) if errors == 0 else 0
+
+    return {
+        "base": base,
+        "symbol_duration": duration,
+        "message_bits": bits,
+        "separator": separator,
+        "subbands": subbands,
+        "aligned": aligned,
+        "soft": soft,
+        "code": code,
+        "trials": trials,
+        "channel": channel_args,
+        "snr_db": channel.snr_db(),
+        "frame_error_rate": frame_errors/trials,
+        "bit_error_rate": bit_errors/decoded_bits if decoded_bits else None,
+        "effective_bps": delivered_bits/airtime,
+        "decode_latency_per_symbol_ms": 1e3*timer.wall.get("detection", 0.0)/symbols,
+        "crc_correction_ms": 1e3*timer.wall.get("crc", 0.0)/max(trials - frame_errors, 1),
+        "cpu_seconds": timer.cpu,
+        "wall_seconds": timer.wall,
+    }
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the modem through a simulated channel")
+    parser.add_argument('--bases', type=int, nargs='+', default=[4, 16, 64], help='Sender/receiver bases to benchmark')
+    parser.add_argument('--durations', type=float, nargs='+', default=[0.3], help='Symbol durations in seconds')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[8, 31], help='Message lengths in bits')
+    parser.add_argument('--trials', type=int, default=5, help='Messages sent per configuration')
+    parser.add_argument('--attenuation-db', type=float, default=0, help='Path loss in dB')
+    parser.add_argument('--noise-db', type=float, default=-40, help='White noise power in dB full scale')
+    parser.add_argument('--drift-ppm', type=float, default=0, help='Receiver clock error in ppm')
+    parser.add_argument('--echo-delay', type=float, default=0, help='Echo delay in seconds')
+    parser.add_argument('--echo-gain', type=float, default=0, help='Echo amplitude relative to the direct path')
+    parser.add_argument('--no-separator', action='store_true', default=False, help='Use the separator-free symbol encoding')
+    parser.add_argument('--subbands', type=int, nargs='+', default=[1], help='Number of simultaneous tones per symbol')
+    parser.add_argument('--aligned', action='store_true', default=False, help='Use correlation sync and aligned symbol windows in the receiver')
+    parser.add_argument('--soft', action='store_true', default=False, help='Decode the CRC with the reliability of every bit')
+    parser.add_argument('--codes', nargs='+', choices=sorted(CODES), default=['crc'], help='Error correcting codes to benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the messages and of the noise')
+    parser.add_argument('--output', default=None, help='File to write the JSON results to (default: stdout)')
+    args = parser.parse_args()
+
+    channel_args = {"attenuation_db": args.attenuation_db, "noise_db": args.noise_db, "drift_ppm": args.drift_ppm,
+                    "echo_delay": args.echo_delay, "echo_gain": args.echo_gain}
+    results = [run_config(base, duration, bits, channel_args, args.trials, seed = args.seed, separator = not args.no_separator, subbands = subbands, aligned = args.aligned, soft = args.soft, code = code)
+               for code in args.codes for base in args.bases for subbands in args.subbands for duration in args.durations for bits in args.lengths]
+
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
@@ -0,0 +1,37 @@
+import argparse
+import random
+import timeit
+from crc import CRC_POLY, polyDivision, polyDivisionBitwise
+
+def benchDivision(bits : int, error_bits : int = 2, repeat : int = 5, number : int = 200) :
+    '''
+        Times polyDivision against the bit serial polyDivisionBitwise on random dividends
+        Parameters:
+            bits (int): The size of the dividend in bits
+            error_bits (int): Selects the CRC_POLY table the polynomial is taken from (Default value 2)
+            repeat (int): Number of timing runs, the best one is reported
+            number (int): Number of divisions per timing run
+        Returns:
+            (bitwise, table) (tuple[float]): Best time per division in microseconds for each routine
+    '''
+    capacity, degree, poly = next((entry for entry in CRC_POLY[error_bits] if entry[0] >= bits), CRC_POLY[error_bits][-1])
+    dividends = [random.getrandbits(bits) | (1 << (bits - 1)) for _ in range(number)]
+    for dividend in dividends:
+        assert polyDivision(dividend, poly, degree) == polyDivisionBitwise(dividend, poly, degree)
+    results = []
+    for routine in (polyDivisionBitwise, polyDivision):
+        best = min(timeit.repeat(lambda: [routine(dividend, poly, degree) for dividend in dividends], repeat = repeat, number = 1))
+        results.append(best / number * 1e6)
+    return tuple(results)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Microbenchmark of the table driven CRC division against the bit serial one")
+    parser.add_argument('--bits', type=int, nargs='+', default=[16, 64, 256, 1025], help='Dividend sizes to benchmark')
+    parser.add_argument('--error-bits', type=int, default=2, choices=[2, 3], help='CRC_POLY table to take the polynomial from')
+    args = parser.parse_args()
+
+    print(f"{'bits':>6} {'bitwise (us)':>14} {'table (us)':>12} {'speedup':>8}")
+    for bits in args.bits:
+        bitwise, table = benchDivision(bits, args.error_bits)
+        print(f"{bits:>6} {bitwise:>14.2f} {table:>12.2f} {bitwise / table:>7.1f}x")
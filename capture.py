@@ -0,0 +1,359 @@
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+import pyaudio
+from scipy.io import wavfile
+
+class CaptureRing:
+    """
+    Single producer / single consumer ring buffer of float32 samples.
+    The producer (the PyAudio callback thread) only ever advances `written` and the consumer (the decode thread)
+    only ever advances `consumed`, so neither side takes a lock. When the decoder falls behind, incoming samples
+    which do not fit are dropped and counted instead of overwriting samples which were not read yet.
+    """
+
+    def __init__(self, capacity: int):
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.written = 0
+        self.consumed = 0
+        self.pending = 0
+        self.overruns = 0
+        self.dropped_samples = 0
+        self.input_overflows = 0
+        self.data_ready = threading.Event()
+        self.closed = False
+        self.stream = None
+
+    def write(self, samples: np.ndarray):
+        """
+        Append samples to the ring, dropping whatever does not fit.
+
+        Parameters:
+            samples (np.ndarray): float32 samples to append
+        """
+        free = self.capacity - (self.written - self.consumed)
+        if len(samples) > free:
+            self.overruns += 1
+            self.dropped_samples += len(samples) - free
+            samples = samples[:free]
+        start = self.written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.buffer[start:start+first] = samples[:first]
+        self.buffer[:len(samples)-first] = samples[first:]
+        self.written += len(samples)
+        self.data_ready.set()
+
+    def callback(self, in_data, frame_count, time_info, status):
+        """
+        PyAudio input callback writing every captured buffer into the ring.
+        """
+        if status & pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        self.write(np.frombuffer(in_data, dtype=np.float32))
+        return None, pyaudio.paContinue
+
+    def available(self)-> int:
+        """
+        Number of captured samples which were not read yet.
+        """
+        return self.written - self.consumed - self.pending
+
+    def read_samples(self, count: int, timeout: float = None)-> np.ndarray:
+        """
+        Wait for and return the next `count` samples.
+        The returned array is a view into the ring whenever it does not wrap around, it stays valid until the next call.
+
+        Parameters:
+            count (int): Number of samples to read, at most the capacity of the ring
+            timeout (float): Seconds to wait for the samples before raising TimeoutError (default: wait forever)
+
+        Returns:
+            np.ndarray: float32 array of `count` samples
+
+        Raises:
+            EOFError: finish was called before `count` more samples were captured
+        """
+        self.consumed += self.pending
+        self.pending = 0
+        while self.written - self.consumed < count:
+            self.data_ready.clear()
+            if self.written - self.consumed >= count:
+                break
+            if self.closed:
+                raise EOFError("The capture was finished")
+            if not self.data_ready.wait(timeout):
+                raise TimeoutError("No audio captured within the timeout")
+        start = self.consumed % self.capacity
+        if start + count <= self.capacity:
+            samples = self.buffer[start:start+count]
+        else:
+            samples = np.concatenate((self.buffer[start:], self.buffer[:start+count-self.capacity]))
+        self.pending = count
+        return samples
+
+    def finish(self):
+        """
+        Wake up the reader and make it raise EOFError once it read every captured sample, e.g. to shut it down.
+        """
+        self.closed = True
+        self.data_ready.set()
+
+    def stats(self)-> dict:
+        """
+        Counters describing whether the decoder keeps up with the capture.
+        """
+        return {"captured_samples": self.written + self.dropped_samples, "dropped_samples": self.dropped_samples,
+                "overruns": self.overruns, "input_overflows": self.input_overflows, "backlog_samples": self.available()}
+
+    def stop_stream(self):
+        self.stream.stop_stream()
+
+    def close(self):
+        self.stream.close()
+
+
+class FileSource:
+    """
+    Sample source reading a WAV recording through a memory map, standing in for a live stream.
+    Samples are converted to float32 one window at a time, so a recording of any length decodes as fast as the CPU
+    allows without being loaded into memory.
+    """
+
+    def __init__(self, path: str):
+        self.sample_rate, self.samples = wavfile.read(path, mmap=True)
+        self.position = 0
+        if np.issubdtype(self.samples.dtype, np.integer):
+            info = np.iinfo(self.samples.dtype)
+            self.offset = (int(info.max) + int(info.min) + 1) / 2
+            self.scale = 1 / (int(info.max) + 1 - self.offset)
+        else:
+            self.offset, self.scale = 0, 1
+
+    def available(self)-> int:
+        """
+        Number of samples which were not read yet.
+        """
+        return len(self.samples) - self.position
+
+    def read_samples(self, count: int, timeout: float = None)-> np.ndarray:
+        """
+        Return the next `count` samples of the first channel as float32 in [-1, 1).
+
+        Parameters:
+            count (int): Number of samples to read
+            timeout (float): Unused, present for compatibility with CaptureRing
+
+        Returns:
+            np.ndarray: float32 array of `count` samples
+        """
+        if self.available() < count:
+            raise EOFError("Reached the end of the recording")
+        window = self.samples[self.position:self.position+count]
+        self.position += count
+        if window.ndim > 1:
+            window = window[:, 0]
+        return ((window.astype(np.float32) - self.offset) * self.scale).astype(np.float32, copy=False)
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        self.samples = None
+
+
+class ArraySource(FileSource):
+    """
+    Sample source reading from an in-memory array, e.g. the output of a simulated channel.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int = 44100):
+        self.sample_rate, self.samples = sample_rate, samples
+        self.position = 0
+        self.offset, self.scale = 0, 1
+
+
+class SharedRing:
+    """
+    Ring buffer of float32 samples in shared memory, written by one producer and read by several processes.
+    Every reader (see RingReader) has its own read position in the shared header, so all of them decode the same
+    samples without any copy. The producer only ever overwrites samples every attached reader is done with; when the
+    slowest reader falls that far behind, a live capture drops what does not fit (counted like CaptureRing) while a
+    recording is written blocking, so offline decoding never loses samples.
+    """
+
+    # Header layout: written samples, closed flag, then the read position of every reader (-1 until attached and once detached)
+    WRITTEN, CLOSED, READERS = 0, 1, 2
+
+    def __init__(self, capacity: int, readers: int):
+        self.capacity = capacity
+        self.readers = readers
+        self.memory = shared_memory.SharedMemory(create=True, size=8*(self.READERS + readers) + 4*capacity)
+        self.header, self.buffer = self.views(self.memory, capacity, readers)
+        self.header[:] = 0
+        self.header[self.READERS:] = -1
+        self.overruns = 0
+        self.dropped_samples = 0
+        self.input_overflows = 0
+        self.stream = None
+
+    @classmethod
+    def views(cls, memory: shared_memory.SharedMemory, capacity: int, readers: int)-> tuple:
+        """
+        Header and sample arrays laid over a shared memory block.
+        """
+        header = np.ndarray(cls.READERS + readers, dtype=np.int64, buffer=memory.buf)
+        buffer = np.ndarray(capacity, dtype=np.float32, buffer=memory.buf, offset=8*(cls.READERS + readers))
+        return header, buffer
+
+    def reader_args(self, index: int)-> tuple:
+        """
+        Arguments of RingReader attaching reader `index` to this ring, picklable to hand to another process.
+        """
+        return self.memory.name, self.capacity, self.readers, index
+
+    def attached(self)-> np.ndarray:
+        """
+        Whether every reader is attached, see RingReader.
+        """
+        return self.header[self.READERS:] >= 0
+
+    def free(self)-> int:
+        """
+        Number of samples which can be written without overwriting samples an attached reader did not read yet.
+        """
+        positions = self.header[self.READERS:]
+        attached = positions[positions >= 0]
+        slowest = int(attached.min()) if len(attached) > 0 else int(self.header[self.WRITTEN])
+        return self.capacity - (int(self.header[self.WRITTEN]) - slowest)
+
+    def write(self, samples: np.ndarray, block: bool = False, stop: threading.Event = None):
+        """
+        Append samples to the ring.
+
+        Parameters:
+            samples (np.ndarray): float32 samples to append
+            block (bool): Wait for the readers to make room instead of dropping the samples which do not fit
+            stop (threading.Event): Gives up waiting once set, the remaining samples are not written
+        """
+        while block and len(samples) > 0:
+            free = self.free()
+            if free > 0:
+                self.write(samples[:free])
+                samples = samples[free:]
+            elif not np.any(self.attached()) or (stop is not None and stop.is_set()):
+                return
+            else:
+                time.sleep(0.001)
+        free = self.free()
+        if len(samples) > free:
+            self.overruns += 1
+            self.dropped_samples += len(samples) - free
+            samples = samples[:free]
+        written = int(self.header[self.WRITTEN])
+        start = written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.buffer[start:start+first] = samples[:first]
+        self.buffer[:len(samples)-first] = samples[first:]
+        self.header[self.WRITTEN] = written + len(samples)
+
+    def callback(self, in_data, frame_count, time_info, status):
+        """
+        PyAudio input callback writing every captured buffer into the ring.
+        """
+        if status & pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        self.write(np.frombuffer(in_data, dtype=np.float32))
+        return None, pyaudio.paContinue
+
+    def finish(self):
+        """
+        Tell the readers no more samples will follow, they get EOFError once they read everything.
+        """
+        self.header[self.CLOSED] = 1
+
+    def stats(self)-> dict:
+        """
+        Counters describing whether the decoders keep up with the capture.
+        """
+        return {"captured_samples": int(self.header[self.WRITTEN]) + self.dropped_samples, "dropped_samples": self.dropped_samples,
+                "overruns": self.overruns, "input_overflows": self.input_overflows}
+
+    def stop_stream(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.buffer, self.header = None, None
+        self.memory.close()
+        self.memory.unlink()
+
+
+class RingReader:
+    """
+    One reader of a SharedRing, attached by name from any process.
+    """
+
+    def __init__(self, name: str, capacity: int, readers: int, index: int, poll: float = 0.002):
+        self.memory = shared_memory.SharedMemory(name=name)
+        self.capacity = capacity
+        self.header, self.buffer = SharedRing.views(self.memory, capacity, readers)
+        self.slot = SharedRing.READERS + index
+        self.poll = poll
+        self.pending = 0
+        # Reads from the samples written from now on, the producer waits for this reader from here
+        self.header[self.slot] = self.header[SharedRing.WRITTEN]
+
+    def available(self)-> int:
+        """
+        Number of written samples which were not read yet.
+        """
+        return int(self.header[SharedRing.WRITTEN]) - int(self.header[self.slot]) - self.pending
+
+    def read_samples(self, count: int, timeout: float = None)-> np.ndarray:
+        """
+        Wait for and return the next `count` samples, see CaptureRing.read_samples.
+
+        Raises:
+            EOFError: The producer finished before `count` more samples were written
+        """
+        self.header[self.slot] += self.pending
+        self.pending = 0
+        waited = 0.0
+        while True:
+            closed = self.header[SharedRing.CLOSED]
+            if self.available() >= count:
+                break
+            if closed:
+                raise EOFError("Reached the end of the shared capture")
+            if timeout is not None and waited >= timeout:
+                raise TimeoutError("No audio captured within the timeout")
+            time.sleep(self.poll)
+            waited += self.poll
+        start = int(self.header[self.slot]) % self.capacity
+        if start + count <= self.capacity:
+            samples = self.buffer[start:start+count]
+        else:
+            samples = np.concatenate((self.buffer[start:], self.buffer[:start+count-self.capacity]))
+        self.pending = count
+        return samples
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        """
+        Detach from the ring, the producer stops waiting for this reader.
+        """
+        if self.buffer is None:
+            return
+        self.header[self.slot] = -1
+        self.buffer, self.header = None, None
+        try:
+            self.memory.close()
+        except BufferError:
+            # A window returned by read_samples is still referenced, the mapping goes away with it
+            pass
@@ -0,0 +1,57 @@
+import numpy as np
+
+class Channel:
+    """
+    Synthetic acoustic channel used to exercise the modem without audio hardware.
+    The signal is delayed by an echo, attenuated, resampled to emulate the clock drift between the sender and the
+    receiver and finally buried in white gaussian noise.
+    """
+
+    def __init__(self, attenuation_db: float = 0, noise_db: float = -60, drift_ppm: float = 0, echo_delay: float = 0, echo_gain: float = 0, seed: int = None):
+        """
+        Parameters:
+            attenuation_db (float): Loss of the path in dB
+            noise_db (float): Power of the additive white gaussian noise in dB relative to full scale, None for no noise
+            drift_ppm (float): Receiver clock error in parts per million, positive values make the receiver sample faster
+            echo_delay (float): Delay of the single echo in seconds
+            echo_gain (float): Amplitude of the echo relative to the direct path
+            seed (int): Seed of the noise generator
+        """
+        self.attenuation_db = attenuation_db
+        self.noise_db = noise_db
+        self.drift_ppm = drift_ppm
+        self.echo_delay = echo_delay
+        self.echo_gain = echo_gain
+        self.rng = np.random.default_rng(seed)
+
+    def apply(self, audio_signal: np.ndarray, sample_rate: int = 44100)-> np.ndarray:
+        """
+        Pass an audio signal through the channel.
+
+        Parameters:
+            audio_signal (np.ndarray): Numpy array containing the transmitted audio signal
+            sample_rate (int): Sampling rate in Hz
+
+        Returns:
+            np.ndarray: float32 numpy array containing the received audio signal
+        """
+        received = np.asarray(audio_signal, dtype=np.float64)
+        delay = int(round(self.echo_delay * sample_rate))
+        if self.echo_gain != 0 and delay > 0:
+            received = np.concatenate((received, np.zeros(delay)))
+            received[delay:] += self.echo_gain * received[:-delay].copy()
+        received = received * 10**(-self.attenuation_db/20)
+        if self.drift_ppm != 0:
+            positions = np.arange(0, len(received) - 1, 1 + self.drift_ppm*1e-6)
+            received = np.interp(positions, np.arange(len(received)), received)
+        if self.noise_db is not None:
+            received = received + self.rng.normal(0, 10**(self.noise_db/20), len(received))
+        return received.astype(np.float32)
+
+    def snr_db(self, amplitude: float = 1)-> float:
+        """
+        Signal to noise ratio of a sine of the given amplitude at the output of the channel.
+        """
+        if self.noise_db is None:
+            return float("inf")
+        return 10*np.log10(amplitude**2/2) - self.attenuation_db - self.noise_db
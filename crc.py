@@ -1,3 +1,11 @@
+import os
+import json
+import heapq
+import zipfile
+from functools import lru_cache
+import numpy as np
+from stats import STATS, instrument
+
 CRC_POLY = {
     2 : [
         (4, 7, 0xe5),
@@ -14,18 +22,36 @@ CRC_POLY = {
         (1005, 20, 0x191513)
     ],
     3 : [
-        (5, 10, 0x29b),
-        (12, 11, 0x571),
-        (13, 14, 0x28a9),
-        (16, 15, 0x5bd5),
-        (46, 17, 0x1751b),
-        (49, 20, 0x8810e),
-        (106, 21, 0x12faa5),
-        (231, 24, 0x880ee6),
-        (484, 27, 0x521f64b),
+        (5, 10, 0x537),
+        (12, 11, 0xae3),
+        (13, 14, 0x5153),
+        (16, 15, 0xb7ab),
+        (46, 17, 0x2ea37),
+        (49, 20, 0x11021d),
+        (106, 21, 0x25f54b),
+        (231, 24, 0x1101dcd),
+        (484, 27, 0xa43ec97),
     ]
 }
 
+# Polynomials beyond CRC_POLY found by crc_search.py, loaded the first time a message does not fit the table above
+CRC_POLY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crc_polys.json")
+
+@lru_cache(maxsize = 4)
+def loadPolyFile(path : str = CRC_POLY_FILE) :
+    '''
+        Loads the searched polynomials of a data file written by crc_search.py
+        Parameters:
+            path (str): The data file; Default value CRC_POLY_FILE
+        Returns:
+            table (dict[int, list[tuple[int]]]): (capacity, degree, poly) entries per number of corrected bits, like CRC_POLY; empty if the file does not exist
+    '''
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        table = json.load(file)
+    return {int(error_bits) : [(capacity, degree, int(poly, 16)) for capacity, degree, poly in entries] for error_bits, entries in table.items()}
+
 def preamble(bits : int) -> int:
     '''
         Returns the binary representation of the given integer in a string format
@@ -59,11 +85,35 @@ def bitsToPoly(bits : int, error_bits : int  = 2) :
     for (bitCapacity, degree, poly) in CRC_POLY[error_bits]:
         if bitCapacity >= bits:
             return poly, degree
-    raise AssertionError("The given message size is too large to be handled by the current implementation")    
+    for (bitCapacity, degree, poly) in loadPolyFile().get(error_bits, []):
+        if bitCapacity >= bits:
+            return poly, degree
+    raise AssertionError("The given message size is too large to be handled by the current implementation, see crc_search.py")    
+
+@lru_cache(maxsize = 32)
+def divisionTable(poly : int, degree : int, chunk_bits : int = 8) :
+    '''
+        Builds the lookup table used by polyDivision, table[t] is the remainder of (t << degree) divided by the polynomial
+        Parameters:
+            poly (int): An integer representing the polynomial used as divisor
+            degree (int): The degree of the given polynomial
+            chunk_bits (int): The number of dividend bits consumed per table lookup (Default value 8)
+        Returns:
+            table (list[int]): The remainders of every chunk_bits wide value shifted up by degree
+    '''
+    table = []
+    for top in range(1 << chunk_bits):
+        remainder = top << degree
+        for i in range(degree + chunk_bits - 1, degree - 1, -1):
+            if (remainder >> i) & 1:
+                remainder ^= poly << (i - degree)
+        table.append(remainder)
+    return table
 
 def polyDivision(dividend : int, poly : int, degree : int) :
     '''
         Divided the given dividend by the given polynomial and returns the remainder
+        The dividend is consumed a byte at a time using a per polynomial lookup table, so it can be of any length
         Parameters:
             dividend (int): An integer which has to be divided
             poly (int): An integer representing the polynomial used as divisor
@@ -71,9 +121,28 @@ def polyDivision(dividend : int, poly : int, degree : int) :
         Returns:
             remainder (int): Returns the remainder of the polynomial division
     '''
-    i : int = 60
-    while i >= 0 and (not ((dividend >> i) & 1)):
-        i -= 1
+    dividend = int(dividend)
+    if dividend >> degree == 0:
+        return dividend
+    table = divisionTable(poly, degree)
+    mask = (1 << degree) - 1
+    remainder = 0
+    for byte in dividend.to_bytes((dividend.bit_length() + 7) // 8, "big"):
+        combined = (remainder << 8) | byte
+        remainder = (combined & mask) ^ table[combined >> degree]
+    return remainder
+
+def polyDivisionBitwise(dividend : int, poly : int, degree : int) :
+    '''
+        Bit serial reference implementation of polyDivision, reducing one bit of the dividend at a time
+        Parameters:
+            dividend (int): An integer which has to be divided
+            poly (int): An integer representing the polynomial used as divisor
+            degree (int): The degree of the given polynomial
+        Returns:
+            remainder (int): Returns the remainder of the polynomial division
+    '''
+    i : int = dividend.bit_length() - 1
     while i >= degree :
         dividend ^= (poly<<(i-degree))
         i -= 1
@@ -81,6 +150,7 @@ def polyDivision(dividend : int, poly : int, degree : int) :
             i -= 1
     return dividend
 
+@instrument("crc_brute_check")
 def bruteCheck(dividend : int, degree : int, poly : int, bits : int, error_bits : int = 2) :
     '''
         Iterates over all possible double/triple bit errors and checks whether the modified dividend is perfectly divisible by the polynomial
@@ -97,21 +167,182 @@ def bruteCheck(dividend : int, degree : int, poly : int, bits : int, error_bits
     if error_bits == 2:
         for i in range(bits + degree - 1):
             for j in range(i+1, bits + degree):
+                STATS.count("crc_candidates")
                 if polyDivision(dividend ^ (1 << i) ^ (1 << j), poly = poly, degree = degree) == 0:
                     possible.append(dividend ^ (1 << i) ^ (1 << j))
     else:
         for i in range(bits + degree - 2):
             for j in range(i+1, bits + degree - 1):
                 for k in range(j+1, bits + degree):
+                    STATS.count("crc_candidates")
                     if polyDivision(dividend ^ (1 << i) ^ (1 << j) ^ (1 << k), poly = poly, degree = degree) == 0:
                         possible.append(dividend ^ (1 << i) ^ (1 << j) ^ (1 << k))
 
     if len(possible) == 0:
         for i in range(bits + degree):
+            STATS.count("crc_candidates")
             if polyDivision(dividend = dividend ^ (1 << i), poly = poly, degree = degree) == 0:
                 possible.append(dividend ^ (1 << i))
     return possible
 
+SYNDROME_CACHE_DIR = None
+
+BATCH_OK, BATCH_CORRECTED, BATCH_FAILED = 0, 1, 2
+
+@lru_cache(maxsize = 8)
+def singleBitSyndromes(poly : int, degree : int, length : int) :
+    '''
+        Computes the remainder of every single bit error pattern x^i modulo the polynomial, for i in [0, length)
+        Parameters:
+            poly (int): An integer representing the polynomial used as divisor
+            degree (int): The degree of the given polynomial
+            length (int): The total number of bits in the transmission (message and redundancy)
+        Returns:
+            syndromes (list[int]): syndromes[i] is the remainder of (1 << i) divided by the polynomial
+    '''
+    syndromes = []
+    remainder = 1
+    for _ in range(length):
+        syndromes.append(remainder)
+        remainder <<= 1
+        if (remainder >> degree) & 1:
+            remainder ^= poly
+    return syndromes
+
+def unpackPositions(code : int, weight : int) :
+    '''
+        Returns the bit error mask represented by positions packed 16 bits apart in a single integer
+    '''
+    mask = 0
+    for shift in range(weight):
+        mask |= 1 << ((code >> (16 * shift)) & 0xffff)
+    return mask
+
+def buildSyndromeIndex(poly : int, degree : int, length : int) :
+    '''
+        Builds the syndrome -> error pattern index for all single and double bit errors in a transmission
+        Every weight is held as two flat arrays sorted by syndrome, so the index of a 4072 bit transmission (8 million
+        double errors) takes tens of megabytes where a dict of tuples would take gigabytes
+        Triple bit errors are not tabulated (the table would be cubic in size), they are resolved in lookupSyndrome by pairing every single bit syndrome with the double bit table
+        Parameters:
+            poly (int): An integer representing the polynomial used as divisor
+            degree (int): The degree of the given polynomial
+            length (int): The total number of bits in the transmission (message and redundancy)
+        Returns:
+            index (dict[int, tuple[np.ndarray, np.ndarray]]): index[weight] is the sorted syndromes of the error patterns of that weight, and their positions packed as in unpackPositions
+    '''
+    dtype = np.uint32 if degree <= 32 else np.uint64
+    syndromes = np.array(singleBitSyndromes(poly = poly, degree = degree, length = length), dtype = dtype)
+    positions = np.arange(length, dtype = np.uint32)
+    index = {1 : syndromeTable(syndromes, positions)}
+    if length < 2:
+        index[2] = (np.zeros(0, dtype = dtype), np.zeros(0, dtype = np.uint32))
+        return index
+    # Pairs (i, j > i) in increasing order, the stable sort keeps that order among equal syndromes
+    double = np.concatenate([syndromes[i] ^ syndromes[i+1:] for i in range(length - 1)])
+    codes = np.concatenate([positions[i] | (positions[i+1:] << 16) for i in range(length - 1)])
+    index[2] = syndromeTable(double, codes)
+    return index
+
+def syndromeTable(syndromes : np.ndarray, codes : np.ndarray) :
+    '''
+        Returns the syndromes sorted for np.searchsorted, along with the packed error positions in the same order
+    '''
+    order = np.argsort(syndromes, kind = "stable")
+    return syndromes[order], codes[order]
+
+def syndromeCachePath(poly : int, degree : int, length : int, cache_dir : str) -> str:
+    '''
+        Returns the file used to persist the syndrome index of the given (poly, degree, length)
+    '''
+    return os.path.join(cache_dir, f"syndrome_{poly:x}_{degree}_{length}.npz")
+
+def loadSyndromeIndex(path : str, length : int) :
+    '''
+        Loads a syndrome index saved by syndromeIndex, returns None unless the file holds arrays of the expected shape
+        Object arrays are refused (np.load without allow_pickle), a cache file can not run code
+    '''
+    try:
+        with np.load(path) as arrays:
+            index = {weight : (arrays[f"syndromes{weight}"], arrays[f"codes{weight}"]) for weight in (1, 2)}
+    except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+    sizes = {1 : length, 2 : length * (length - 1) // 2}
+    for weight, (syndromes, codes) in index.items():
+        if syndromes.shape != (sizes[weight],) or codes.shape != (sizes[weight],) or syndromes.dtype.kind != "u" or codes.dtype != np.uint32:
+            return None
+    return index
+
+def syndromeIndex(poly : int, degree : int, length : int, cache_dir : str = None) :
+    '''
+        Returns the syndrome index of the given (poly, degree, length), building it once and keeping it in an LRU cache
+        If a cache directory is given (or SYNDROME_CACHE_DIR is set) the index is loaded from / saved to disk as well
+        Parameters:
+            poly (int): An integer representing the polynomial used as divisor
+            degree (int): The degree of the given polynomial
+            length (int): The total number of bits in the transmission (message and redundancy)
+            cache_dir (str): Directory in which the index is persisted; Default value None (use SYNDROME_CACHE_DIR)
+        Returns:
+            index (dict[int, tuple[np.ndarray, np.ndarray]]): See buildSyndromeIndex
+    '''
+    # Resolved on every call, so that setting SYNDROME_CACHE_DIR later is not hidden by the LRU cache
+    return cachedSyndromeIndex(poly, degree, length, cache_dir or SYNDROME_CACHE_DIR)
+
+@lru_cache(maxsize = 8)
+def cachedSyndromeIndex(poly : int, degree : int, length : int, cache_dir : str) :
+    '''
+        Returns the syndrome index of the given (poly, degree, length), see syndromeIndex
+    '''
+    if cache_dir is not None:
+        path = syndromeCachePath(poly = poly, degree = degree, length = length, cache_dir = cache_dir)
+        if os.path.exists(path):
+            index = loadSyndromeIndex(path, length)
+            if index is not None:
+                return index
+    index = buildSyndromeIndex(poly = poly, degree = degree, length = length)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok = True)
+        np.savez(path, **{f"{name}{weight}" : array for weight in (1, 2) for name, array in zip(("syndromes", "codes"), index[weight])})
+    return index
+
+def lookupSyndrome(syndrome : int, poly : int, degree : int, length : int, error_bits : int = 2) :
+    '''
+        Finds every error pattern of the highest possible weight (at most error_bits) having the given syndrome
+        Parameters:
+            syndrome (int): The remainder of the received transmission
+            poly (int): An integer representing the polynomial used as divisor
+            degree (int): The degree of the given polynomial
+            length (int): The total number of bits in the transmission (message and redundancy)
+            error_bits (int): The number of bit errors needed to be handled; Default value 2; Supported values are 2 & 3
+        Returns:
+            masks (list[int]): The error masks which, XORed onto the transmission, make it divisible by the polynomial
+    '''
+    index = syndromeIndex(poly, degree, length)
+    double, double_codes = index[2]
+    if error_bits == 3:
+        # Every bit k paired with the double errors completing the syndrome, all bits searched at once
+        syndromes = np.array(singleBitSyndromes(poly = poly, degree = degree, length = length), dtype = double.dtype)
+        targets = syndromes ^ syndromes.dtype.type(syndrome)
+        starts = np.searchsorted(double, targets, side = "left")
+        ends = np.searchsorted(double, targets, side = "right")
+        triples = set()
+        for k in np.flatnonzero(ends > starts):
+            for code in double_codes[starts[k]:ends[k]]:
+                i, j = int(code) & 0xffff, int(code) >> 16
+                if k != i and k != j:
+                    triples.add(tuple(sorted((i, j, int(k)))))
+        if len(triples) > 0:
+            return [(1 << i) ^ (1 << j) ^ (1 << k) for (i, j, k) in sorted(triples)]
+    for weight in (2, 1):
+        if weight > error_bits:
+            continue
+        syndromes, codes = index[weight]
+        start = np.searchsorted(syndromes, syndrome, side = "left")
+        end = np.searchsorted(syndromes, syndrome, side = "right")
+        if end > start:
+            return [unpackPositions(int(code), weight) for code in codes[start:end]]
+    return []
+
 def encodeCrc(message, error_bits : int = 2) :
     '''
         Encodes the given message and adds redundancy using CRC for error detection and correction
@@ -125,10 +356,11 @@ def encodeCrc(message, error_bits : int = 2) :
     poly, degree = bitsToPoly(bits = bits, error_bits = error_bits)
     messageInt = 0
     for bit in message:
-        messageInt = 2 * messageInt + bit
+        messageInt = 2 * messageInt + int(bit)
     encoding = (messageInt << degree) ^ polyDivision(dividend = (messageInt << degree), poly = poly, degree = degree)
     return [(encoding >> i) & 1 for i in range(bits + degree - 1, -1, -1)]
 
+@instrument("crc_decode")
 def decodeCrc(transmission, bits : int, error_bits : int = 2) :
     '''
         Decodes the given transmission, detects and corrects errors
@@ -139,16 +371,209 @@ def decodeCrc(transmission, bits : int, error_bits : int = 2) :
         Returns:
             decoded (list[int]): The original message without any redundancy and errors
     '''
-    poly, degree = bitsToPoly(bits = bits)
+    poly, degree = bitsToPoly(bits = bits, error_bits = error_bits)
     transmissionInt = 0
     for bit in transmission:
-        transmissionInt = 2 * transmissionInt + bit
-    if polyDivision(dividend = transmissionInt, poly = poly, degree = degree) == 0:
+        transmissionInt = 2 * transmissionInt + int(bit)
+    syndrome = polyDivision(dividend = transmissionInt, poly = poly, degree = degree)
+    if syndrome == 0:
         decoded = transmissionInt
     else:
-        possible = bruteCheck(dividend = transmissionInt, degree = degree, poly = poly, bits = bits, error_bits = error_bits)
+        possible = [transmissionInt ^ mask for mask in lookupSyndrome(syndrome = syndrome, poly = poly, degree = degree, length = bits + degree, error_bits = error_bits)]
+        STATS.count("crc_candidates", len(possible))
         if len(possible) != 1:
             raise AssertionError(f"CRC Decoding Error, total {len(possible)} possible decodings!")
         decoded = possible[0]
     decoded >>= degree
     return [(decoded >> i) & 1 for i in range(bits - 1, -1, -1)]
+
+
+def orderedFlips(costs) :
+    '''
+        Enumerates the subsets of the given positions by increasing total cost, starting with the empty subset
+        Parameters:
+            costs (list[float]): The cost of every position, sorted in increasing order
+        Returns:
+            flips (generator[tuple[float, tuple[int]]]): (cost, indices into costs) of every subset, cheapest first
+    '''
+    yield 0.0, ()
+    if len(costs) == 0:
+        return
+    heap = [(costs[0], (0,))]
+    while heap:
+        cost, subset = heapq.heappop(heap)
+        yield cost, subset
+        last = subset[-1]
+        if last + 1 < len(costs):
+            heapq.heappush(heap, (cost + costs[last + 1], subset + (last + 1,)))
+            heapq.heappush(heap, (cost - costs[last] + costs[last + 1], subset[:-1] + (last + 1,)))
+
+def chaseSearch(syndrome : int, costs, poly : int, degree : int, length : int, error_bits : int = 2, flip_bits : int = 8, max_errors : int = 3) :
+    '''
+        Finds the most likely error pattern having the given syndrome, see decodeCrcSoft
+        Test patterns flipping the least reliable bits are tried cheapest first, each one followed by the syndrome lookup; among the resulting error patterns the one whose bits have the lowest total cost wins, and the search stops once no cheaper test pattern remains
+        Equal costs (the bits of a symbol share their reliability) are settled towards the hard decisions, by the fewest bits flipped
+        Parameters:
+            syndrome (int): The remainder of the received transmission
+            costs (list[float]): The cost of flipping every bit, indexed by position from the least significant bit
+            poly (int): An integer representing the polynomial used as divisor
+            degree (int): The degree of the given polynomial
+            length (int): The total number of bits in the transmission (message and redundancy)
+            error_bits (int): The number of bit errors corrected by the syndrome lookup; Default value 2
+            flip_bits (int): The number of least reliable bits test patterns are built from; Default value 8
+            max_errors (int): The largest number of corrected bits accepted; Default value 3
+        Returns:
+            error (int): The error mask, raises AssertionError unless a single most likely one within max_errors bits exists
+    '''
+    syndromes = singleBitSyndromes(poly = poly, degree = degree, length = length)
+    least = sorted(range(length), key = lambda position: costs[position])[:flip_bits]
+    best, best_key, ambiguous = None, (float("inf"), 0), False
+    for flip_cost, subset in orderedFlips([costs[position] for position in least]):
+        if flip_cost > best_key[0]:
+            break
+        flips, remainder = 0, syndrome
+        for k in subset:
+            flips ^= 1 << least[k]
+            remainder ^= syndromes[least[k]]
+        masks = [0] if remainder == 0 else lookupSyndrome(syndrome = remainder, poly = poly, degree = degree, length = length, error_bits = error_bits)
+        STATS.count("crc_test_patterns")
+        STATS.count("crc_candidates", len(masks))
+        for mask in masks:
+            error, cost, rest = flips ^ mask, 0.0, flips ^ mask
+            while rest:
+                lowest = rest & -rest
+                cost += costs[lowest.bit_length() - 1]
+                rest ^= lowest
+            key = (cost, bin(error).count("1"))
+            if key < best_key:
+                best, best_key, ambiguous = error, key, False
+            elif key == best_key and error != best:
+                ambiguous = True
+    if best is None or ambiguous or best_key[1] > max_errors:
+        raise AssertionError("CRC Decoding Error, no unique most likely decoding!")
+    return best
+
+@instrument("crc_soft_decode")
+def decodeCrcSoft(transmission, reliability, bits : int, error_bits : int = 2, flip_bits : int = 8, max_errors : int = None) :
+    '''
+        Decodes the given transmission using the reliability of every received bit (Chase decoding)
+        A transmission decodeCrc corrects is decoded the same way; only when the syndrome lookup finds no single correction are the reliabilities used, see chaseSearch
+        Parameters:
+            transmission (list[int]): The bit stream message received after the preamble
+            reliability (list[float]): The non negative confidence of every bit of the transmission, e.g. a log likelihood ratio magnitude
+            bits (int): Denotes the size of the original message without the redundancy, this is obtained from preamble
+            error_bits (int): The number of bit errors corrected by the syndrome lookup; Default value 2; Supported values are 2 & 3
+            flip_bits (int): The number of least reliable bits test patterns are built from; Default value 8
+            max_errors (int): The largest number of corrected bits accepted; Default value None (error_bits + 1, which keeps the rate at which random frames are accepted close to decodeCrc)
+        Returns:
+            decoded (list[int]): The original message without any redundancy and errors
+    '''
+    poly, degree = bitsToPoly(bits = bits, error_bits = error_bits)
+    length = bits + degree
+    transmissionInt = 0
+    for bit in transmission:
+        transmissionInt = 2 * transmissionInt + int(bit)
+    syndrome = polyDivision(dividend = transmissionInt, poly = poly, degree = degree)
+    if max_errors is None:
+        max_errors = error_bits + 1
+    if syndrome != 0:
+        masks = lookupSyndrome(syndrome = syndrome, poly = poly, degree = degree, length = length, error_bits = error_bits)
+        if len(masks) == 1:
+            STATS.count("crc_candidates")
+            transmissionInt ^= masks[0]
+        else:
+            costs = [max(float(reliability[length - 1 - position]), 0.0) for position in range(length)]
+            transmissionInt ^= chaseSearch(syndrome, costs, poly, degree, length, error_bits, flip_bits, max_errors)
+    decoded = transmissionInt >> degree
+    return [(decoded >> i) & 1 for i in range(bits - 1, -1, -1)]
+
+
+def syndromeMatrix(poly : int, degree : int, length : int) -> np.ndarray:
+    '''
+        Returns the single bit syndromes as a bit matrix, row c holds the remainder of an error in column c of a transmission (MSB first)
+        Parameters:
+            poly (int): An integer representing the polynomial used as divisor
+            degree (int): The degree of the given polynomial
+            length (int): The total number of bits in the transmission (message and redundancy)
+        Returns:
+            matrix (np.ndarray): (length, degree) uint8 matrix, columns are remainder bits MSB first
+    '''
+    syndromes = np.array(singleBitSyndromes(poly = poly, degree = degree, length = length)[::-1], dtype=np.int64)
+    shifts = np.arange(degree - 1, -1, -1, dtype=np.int64)
+    return ((syndromes[:, None] >> shifts) & 1).astype(np.uint8)
+
+def batchRemainders(frames : np.ndarray, matrix : np.ndarray) -> np.ndarray:
+    '''
+        Computes the CRC remainder of every row of a bit matrix at once, using the linearity of the remainder over GF(2)
+        Parameters:
+            frames (np.ndarray): (batch, length) matrix of 0/1 bits
+            matrix (np.ndarray): (length, degree) syndrome bit matrix, see syndromeMatrix
+        Returns:
+            remainders (np.ndarray): (batch, degree) uint8 matrix of remainder bits MSB first
+    '''
+    return ((frames.astype(np.int32) @ matrix.astype(np.int32)) & 1).astype(np.uint8)
+
+def unpackFrames(frames : np.ndarray, length : int, packed : bool) -> np.ndarray:
+    '''
+        Returns the frames as a (batch, length) uint8 bit matrix, unpacking np.packbits rows if required
+    '''
+    frames = np.atleast_2d(np.asarray(frames, dtype=np.uint8))
+    if packed:
+        frames = np.unpackbits(frames, axis=1, count=length)
+    if frames.shape[1] != length:
+        raise AssertionError(f"Expected frames of {length} bits, got {frames.shape[1]}")
+    return frames
+
+def encodeCrcBatch(messages : np.ndarray, bits : int = None, error_bits : int = 2, packed : bool = False) -> np.ndarray:
+    '''
+        Encodes many same length messages at once, see encodeCrc
+        Parameters:
+            messages (np.ndarray): (batch, bits) uint8 bit matrix, or np.packbits of it along axis 1 if packed is set
+            bits (int): The size of each message, required when packed is set
+            error_bits (int): The number of bit errors needed to be handled; Default value 2; Supported values are 2 & 3
+            packed (bool): Whether the messages (and the returned encodings) are packed 8 bits per byte
+        Returns:
+            encodings (np.ndarray): (batch, bits + degree) uint8 bit matrix of the encoded messages, packed if packed is set
+    '''
+    if bits is None:
+        bits = np.shape(messages)[-1]
+    messages = unpackFrames(messages, bits, packed)
+    poly, degree = bitsToPoly(bits = bits, error_bits = error_bits)
+    matrix = syndromeMatrix(poly = poly, degree = degree, length = bits + degree)
+    encodings = np.hstack([messages, batchRemainders(messages, matrix[:bits])])
+    return np.packbits(encodings, axis=1) if packed else encodings
+
+def decodeCrcBatch(transmissions : np.ndarray, bits : int, error_bits : int = 2, packed : bool = False) :
+    '''
+        Decodes many same length transmissions at once, see decodeCrc
+        Remainders are computed for the whole batch at once, error correction is only looked up for the rows which need it
+        Parameters:
+            transmissions (np.ndarray): (batch, bits + degree) uint8 bit matrix, or np.packbits of it along axis 1 if packed is set
+            bits (int): Denotes the size of the original message without the redundancy
+            error_bits (int): The number of bit errors needed to be handled; Default value 2; Supported values are 2 & 3
+            packed (bool): Whether the transmissions (and the returned messages) are packed 8 bits per byte
+        Returns:
+            decoded (np.ndarray): (batch, bits) uint8 bit matrix of the corrected messages, rows which failed are left uncorrected
+            status (np.ndarray): (batch,) int8 array, BATCH_OK, BATCH_CORRECTED or BATCH_FAILED for every row
+    '''
+    poly, degree = bitsToPoly(bits = bits, error_bits = error_bits)
+    length = bits + degree
+    frames = unpackFrames(transmissions, length, packed).copy()
+    remainders = batchRemainders(frames, syndromeMatrix(poly = poly, degree = degree, length = length))
+    syndromes = remainders.astype(np.int64) @ (np.int64(1) << np.arange(degree - 1, -1, -1, dtype=np.int64))
+    status = np.full(len(frames), BATCH_OK, dtype=np.int8)
+    corrections = {}
+    for row in np.flatnonzero(syndromes):
+        syndrome = int(syndromes[row])
+        if syndrome not in corrections:
+            corrections[syndrome] = lookupSyndrome(syndrome = syndrome, poly = poly, degree = degree, length = length, error_bits = error_bits)
+        masks = corrections[syndrome]
+        if len(masks) != 1:
+            status[row] = BATCH_FAILED
+            continue
+        for position in range(length):
+            if (masks[0] >> position) & 1:
+                frames[row, length - 1 - position] ^= 1
+        status[row] = BATCH_CORRECTED
+    decoded = frames[:, :bits]
+    return (np.packbits(decoded, axis=1) if packed else decoded), status
@@ -0,0 +1,127 @@
+import argparse
+import json
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+import numpy as np
+from crc import CRC_POLY, CRC_POLY_FILE, loadPolyFile
+
+def correctableLength(poly : int, degree : int, error_bits : int, max_length : int) -> int:
+    '''
+        Returns the longest transmission in which every error pattern of at most error_bits bits has its own syndrome under the given polynomial
+        Patterns are added by increasing highest error position; a new pattern is the new position plus a pattern of fewer bits below it, so only its collisions with the patterns seen so far (marked in a bitmap of all remainders) have to be checked
+        Parameters:
+            poly (int): An integer representing the polynomial, including its x^degree term
+            degree (int): The degree of the given polynomial
+            error_bits (int): The number of bit errors to be corrected
+            max_length (int): The length at which the check stops
+        Returns:
+            length (int): The total number of bits (message and redundancy) the polynomial corrects error_bits errors in, at most max_length
+    '''
+    seen = np.zeros(1 << max(degree - 3, 0), dtype=np.uint8)
+    def mark(syndromes):
+        np.bitwise_or.at(seen, syndromes >> 3, (1 << (syndromes & 7)).astype(np.uint8))
+    def marked(syndromes):
+        return bool(np.any(seen[syndromes >> 3] & (1 << (syndromes & 7)).astype(np.uint8)))
+
+    levels = [np.zeros(1, dtype=np.int64)] + [np.zeros(0, dtype=np.int64) for _ in range(error_bits - 1)]
+    mark(levels[0])
+    syndrome = 1
+    for position in range(max_length):
+        patterns = np.concatenate([syndrome ^ level for level in levels])
+        if marked(patterns):
+            return position
+        mark(patterns)
+        for weight in range(error_bits - 1, 0, -1):
+            levels[weight] = np.concatenate((levels[weight], syndrome ^ levels[weight - 1]))
+        syndrome <<= 1
+        if (syndrome >> degree) & 1:
+            syndrome ^= poly
+    return max_length
+
+def minimumDegree(bits : int, error_bits : int) -> int:
+    '''
+        Returns the Hamming bound on the degree: the remainders must at least tell apart every pattern of at most error_bits errors
+    '''
+    degree = 1
+    while sum(math.comb(bits + degree, weight) for weight in range(error_bits + 1)) > 1 << degree:
+        degree += 1
+    return degree
+
+def checkCandidates(task) :
+    '''
+        Returns the first of the given polynomials correcting error_bits errors in messages of the given size, None if there is none
+        Parameters:
+            task (tuple): (candidates, degree, bits, error_bits), the unit of work handed to a worker process
+    '''
+    candidates, degree, bits, error_bits = task
+    for poly in candidates:
+        if correctableLength(poly, degree, error_bits, bits + degree) >= bits + degree:
+            return poly
+    return None
+
+def searchPoly(bits : int, error_bits : int = 2, workers : int = None, tries : int = 20000, chunk : int = 64, seed : int = 0) :
+    '''
+        Searches for a polynomial of the lowest degree correcting error_bits errors in a message of the given size
+        From the Hamming bound upwards, random polynomials of every degree are checked in chunks spread over a process pool; chunks are consumed in order so the result does not depend on the number of workers
+        Parameters:
+            bits (int): The size of the message to be handled
+            error_bits (int): The number of bit errors needed to be handled (Default value 2)
+            workers (int): The number of worker processes (Default value None, one per CPU)
+            tries (int): The number of polynomials checked per degree before moving to the next one (Default value 20000)
+            chunk (int): The number of polynomials per unit of work (Default value 64)
+            seed (int): The seed of the candidate polynomials (Default value 0)
+        Returns:
+            (capacity, degree, poly) (tuple[int]): A CRC_POLY entry, 'capacity' being the largest message size the polynomial handles
+    '''
+    with Pool(workers) as pool:
+        degree = minimumDegree(bits, error_bits)
+        while True:
+            generator = random.Random(seed * 1000 + degree)
+            candidates = [(1 << degree) | (generator.getrandbits(degree - 1) << 1) | 1 for _ in range(tries)]
+            tasks = [(candidates[i:i+chunk], degree, bits, error_bits) for i in range(0, tries, chunk)]
+            for poly in pool.imap(checkCandidates, tasks):
+                if poly is not None:
+                    pool.terminate()
+                    capacity = correctableLength(poly, degree, error_bits, 4 * (bits + degree)) - degree
+                    return capacity, degree, poly
+            degree += 1
+
+def savePoly(entry, error_bits : int, path : str = CRC_POLY_FILE) -> None:
+    '''
+        Adds a searched polynomial to the data file loaded by bitsToPoly, keeping the entries sorted by capacity
+    '''
+    table = {}
+    if os.path.exists(path):
+        with open(path) as file:
+            table = json.load(file)
+    capacity, degree, poly = entry
+    entries = [row for row in table.get(str(error_bits), []) if row[0] != capacity]
+    entries.append([capacity, degree, hex(poly)])
+    table[str(error_bits)] = sorted(entries)
+    with open(path, "w") as file:
+        file.write("{\n" + ",\n".join(f'  "{key}" : [\n' + ",\n".join(f"    {json.dumps(row)}" for row in rows) + "\n  ]" for key, rows in sorted(table.items())) + "\n}\n")
+    loadPolyFile.cache_clear()
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Search CRC polynomials of minimal degree for messages beyond the CRC_POLY table")
+    parser.add_argument('--bits', type=int, nargs='+', required=True, help='Message sizes to find polynomials for')
+    parser.add_argument('--error-bits', type=int, default=2, choices=[2, 3], help='Number of bit errors to correct')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--tries', type=int, default=20000, help='Polynomials checked per degree')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the candidate polynomials')
+    parser.add_argument('--output', default=CRC_POLY_FILE, help='Data file to add the polynomials to')
+    args = parser.parse_args()
+
+    for bits in args.bits:
+        known = [entry for entry in CRC_POLY[args.error_bits] + loadPolyFile(args.output).get(args.error_bits, []) if entry[0] >= bits]
+        if known:
+            print(f"{bits:>6} bits: already handled by degree {known[0][1]} polynomial {hex(known[0][2])}")
+            continue
+        start = time.perf_counter()
+        capacity, degree, poly = searchPoly(bits, args.error_bits, args.workers, args.tries, seed = args.seed)
+        savePoly((capacity, degree, poly), args.error_bits, args.output)
+        print(f"{bits:>6} bits: degree {degree} polynomial {hex(poly)} handles up to {capacity} bits ({time.perf_counter() - start:.1f} s)")
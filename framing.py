@@ -0,0 +1,150 @@
+import math
+from crc import encodeCrc, decodeCrc, decodeCrcSoft, transmissionLength
+from rs import encodeRs, decodeRs, rsTransmissionLength
+from stats import STATS
+
+SEQUENCE_BITS = 16
+LENGTH_BITS = 32
+FRAME_DATA_BITS = 256
+
+# Error correcting codes a transmission can be protected with: (encode, decode, transmission length)
+CODES = {
+    "crc" : (encodeCrc, decodeCrc, transmissionLength),
+    "rs" : (encodeRs, decodeRs, rsTransmissionLength),
+}
+
+def intToBits(value : int, width : int) :
+    '''
+        Returns the big endian bits of the given integer
+        Parameters:
+            value (int): The integer to be converted
+            width (int): The number of bits of the result
+        Returns:
+            bits (list[int]): The 'width' least significant bits of 'value', most significant first
+    '''
+    return [(value >> i) & 1 for i in range(width - 1, -1, -1)]
+
+def bitsToInt(bits) -> int:
+    '''
+        Inverse of intToBits
+    '''
+    value = 0
+    for bit in bits:
+        value = 2 * value + int(bit)
+    return value
+
+def frameLength(data_bits : int = FRAME_DATA_BITS, code : str = "crc") -> int:
+    '''
+        Returns the number of bits of one protected frame on the air
+        Parameters:
+            data_bits (int): The number of payload bits carried by each frame
+            code (str): The error correcting code of the frames, a key of CODES
+        Returns:
+            frame_length (int): The length of the header, the payload bits and the redundancy together
+    '''
+    return CODES[code][2](2 * SEQUENCE_BITS + data_bits)
+
+def framePayload(payload : bytes, data_bits : int = FRAME_DATA_BITS, code : str = "crc") :
+    '''
+        Splits a payload into protected frames
+        The payload is prefixed by its length in bytes and cut into chunks of 'data_bits' bits (the last one padded with zeros), every chunk is prefixed by a header holding its sequence number and the frame count and encoded
+        Parameters:
+            payload (bytes): The payload to be transmitted
+            data_bits (int): The number of payload bits carried by each frame
+            code (str): The error correcting code of the frames, a key of CODES
+        Returns:
+            frames (list[list[int]]): The encoded frames, each one frameLength(data_bits, code) bits long
+    '''
+    bits = intToBits(len(payload), LENGTH_BITS)
+    for byte in payload:
+        bits += intToBits(byte, 8)
+    frame_count = math.ceil(len(bits) / data_bits)
+    if frame_count >= 1 << SEQUENCE_BITS:
+        raise AssertionError("The given payload is too large to be sequenced by the current implementation")
+    bits += [0] * (frame_count * data_bits - len(bits))
+    frames = []
+    for seq in range(frame_count):
+        header = intToBits(seq, SEQUENCE_BITS) + intToBits(frame_count, SEQUENCE_BITS)
+        frames.append(CODES[code][0](header + bits[seq*data_bits:(seq+1)*data_bits]))
+    return frames
+
+class Reassembler:
+    '''
+        Incrementally collects received frames and rebuilds the payload once every frame has arrived
+    '''
+
+    def __init__(self, data_bits : int = FRAME_DATA_BITS, code : str = "crc"):
+        self.data_bits = data_bits
+        self.code = code
+        self.frame_length = frameLength(data_bits, code)
+        self.frames = {}
+        self.frames_seen = 0
+        self.failed_frames = 0
+        self.frame_count = None
+
+    def total_frames(self) :
+        '''
+            Returns the number of frames of the payload, None until a frame was received correctly
+        '''
+        return self.frame_count
+
+    def add_frame(self, transmission, reliability = None) :
+        '''
+            Decodes a received frame and stores its payload bits
+            Parameters:
+                transmission (list[int]): The frameLength() bits of the frame as received
+                reliability (list[float]): The reliability of every bit, to decode CRC frames with decodeCrcSoft instead of decodeCrc; Default value None
+            Returns:
+                seq (int): The sequence number of the frame, None if it could not be corrected
+        '''
+        self.frames_seen += 1
+        try:
+            if self.code == "crc" and reliability is not None:
+                bits = decodeCrcSoft(transmission = transmission, reliability = reliability, bits = 2 * SEQUENCE_BITS + self.data_bits)
+            else:
+                bits = CODES[self.code][1](transmission, 2 * SEQUENCE_BITS + self.data_bits)
+        except AssertionError:
+            self.failed_frames += 1
+            STATS.count("frames_failed")
+            return None
+        STATS.count("frames_decoded")
+        seq = bitsToInt(bits[:SEQUENCE_BITS])
+        self.frame_count = bitsToInt(bits[SEQUENCE_BITS:2 * SEQUENCE_BITS])
+        self.frames[seq] = bits[2 * SEQUENCE_BITS:]
+        return seq
+
+    def done(self) -> bool:
+        '''
+            Returns whether every frame was seen, either received or lost; frames are sent back to back so nothing else will follow
+        '''
+        total = self.total_frames()
+        return total is not None and self.frames_seen >= total
+
+    def complete(self) -> bool:
+        '''
+            Returns whether every frame of the payload was received correctly
+        '''
+        total = self.total_frames()
+        return total is not None and all(seq in self.frames for seq in range(total))
+
+    def missing(self) :
+        '''
+            Returns the sequence numbers of the frames not received (correctly), None while the length is unknown
+        '''
+        total = self.total_frames()
+        if total is None:
+            return None
+        return [seq for seq in range(total) if seq not in self.frames]
+
+    def payload(self) -> bytes:
+        '''
+            Returns the reassembled payload
+        '''
+        if not self.complete():
+            raise AssertionError(f"Payload incomplete, missing frames {self.missing()}")
+        bits = []
+        for seq in range(self.total_frames()):
+            bits += self.frames[seq]
+        payload_length = bitsToInt(bits[:LENGTH_BITS])
+        bits = bits[LENGTH_BITS:LENGTH_BITS + 8 * payload_length]
+        return bytes(bitsToInt(bits[i:i+8]) for i in range(0, len(bits), 8))
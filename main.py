@@ -1,10 +1,29 @@
-from crc import encodeCrc, decodeCrc, preamble
+from crc import encodeCrc, decodeCrcSoft, preamble
 import math
 import argparse
+import atexit
+import logging
 from receiver import Receiver
 from sender import Sender
+from capture import FileSource
+from framing import framePayload, Reassembler, CODES
+from multistream import MultiReceiver, band_plans
+from stats import STATS
 
-def send() -> None:
+def tone_base(subbands : int = 1, tones : int = 64) -> int:
+
+    # The tone grid is shared between the subbands, each one getting a power of two number of tones
+    return 2 ** int(math.log2(tones // subbands))
+
+def calibrate(receiver : Receiver, noise_dir : str = None) -> None:
+
+    # Starting from the noise profile saved for this microphone if there is one, the receiver keeps it up to date while listening
+    if noise_dir is not None and receiver.load_noise(noise_dir):
+        print("Loaded the noise profile of the input device")
+        return
+    receiver.calibrate(duration=0.03)
+
+def send(output : str = None, separator : bool = True, subbands : int = 1, code : str = "crc", tones : int = 64, start_freq : int = 800) -> None:
 
     # Taking a string input from the user denoting the binary message to be transmitted
     bitstring = input("Please enter the message to be transmitted : ")
@@ -12,10 +31,10 @@ def send() -> None:
     message = [int(element) for element in bitstring]
     bits = len(message)
 
-    # Encoding the message using CRC encoding for upto two bit error correction
-    encoding = encodeCrc(message = message)
+    # Encoding the message using CRC encoding for upto two bit error correction, or Reed-Solomon for upto two symbol errors
+    encoding = encodeCrc(message = message) if code == "crc" else CODES[code][0](message)
 
-    print(f"The encoded bit-string constructed using CRC : {''.join([str(element) for element in encoding])}")
+    print(f"The encoded bit-string constructed using {code.upper()} : {''.join([str(element) for element in encoding])}")
 
     # Introducing errors in the encoded message according to user input
     num_errors = int(input("Please enter the number of bit errors to be introduced : "))
@@ -30,42 +49,163 @@ def send() -> None:
     print(f"The combined transmission is : {preamble(bits)}{''.join([str(element) for element in encoding])}")
 
     # Encoding the preamble and the message to be transmitted to audio signals
-    sender = Sender(64)
-    encoded_audio = sender.encode_bits_to_audio([(bits>>i) & 1 for i in range(4, -1, -1)] + encoding )
+    sender = Sender(tone_base(subbands, tones), separator, subbands, start_freq)
+    symbols = sender.change_base([(bits>>i) & 1 for i in range(4, -1, -1)] + encoding, sender.base)
+
+    # Writing the audio to a WAV file instead of playing it, if requested
+    if output is not None:
+        sender.save_audio(sender.synthesize(symbols), output)
+        print(f"Transmission written to {output}")
+        return
 
     input("Press Enter to start transmission ")
     print("Starting transmission ...")
     
-    sender.send_audio(encoded_audio)
+    sender.send_symbols(symbols)
+    sender.close()
 
     print("Finished transmission !!")
 
 
-def recv():
+def recv(input_path : str = None, separator : bool = True, subbands : int = 1, aligned : bool = False, noise_dir : str = None, code : str = "crc", tones : int = 64, start_freq : int = 800, soft : bool = False):
     
-    # Preparing the receiver to receive the audio signals by calibrating it for background noise
-    receiver = Receiver(64)
-    receiver.calibrate(duration=0.03)
+    receiver = Receiver(tone_base(subbands, tones), separator, subbands, aligned, start_freq)
+    if input_path is None:
+        # Preparing the receiver to receive the audio signals by calibrating it for background noise
+        source, sample_rate = None, 44100
+        calibrate(receiver, noise_dir)
+    else:
+        # Decoding a recording, no audio hardware needed
+        source = FileSource(input_path)
+        sample_rate = source.sample_rate
 
     # Receiving the audio signals and decoding them to binary form
     # bits is the length of the original message and transmission is the received message
-    bits, transmission = receiver.decode_audio_to_bits(bit_duration=0.3)
+    bits, transmission, reliability = receiver.decode_audio_to_bits(sample_rate=sample_rate, bit_duration=0.3, source=source, soft=True, code=code)
+    if input_path is None and noise_dir is not None:
+        receiver.save_noise(noise_dir)
 
-    # Checking and correcting any errors in the received message using the redundancy added by CRC
-    message = decodeCrc(transmission = transmission, bits = bits)
+    # Checking and correcting any errors in the received message using the redundancy added by CRC, least confident bits first if requested
+    if code == "crc" and soft:
+        message = decodeCrcSoft(transmission = transmission, reliability = reliability, bits = bits)
+    else:
+        message = CODES[code][1](transmission, bits)
 
     print(f"The obtained and error corrected message is : {''.join([str(bit) for bit in message])}")
 
+def send_file(path : str, output : str = None, separator : bool = True, subbands : int = 1, code : str = "crc", tones : int = 64, start_freq : int = 800) -> None:
+
+    # Splitting the file into protected frames sent back to back after a single special sequence
+    with open(path, "rb") as file:
+        payload = file.read()
+    sender = Sender(tone_base(subbands, tones), separator, subbands, start_freq)
+    frames = framePayload(payload, code = code)
+    symbols = sender.frame_symbols(frames, sender.base)
+    print(f"Sending {len(payload)} bytes in {len(frames)} frames ({len(symbols)} symbols)")
+
+    if output is not None:
+        sender.save_audio(sender.synthesize(symbols), output)
+        print(f"Transmission written to {output}")
+        return
+
+    input("Press Enter to start transmission ")
+    print("Starting transmission ...")
+    sender.send_symbols(symbols)
+    sender.close()
+    print("Finished transmission !!")
+
+
+def recv_file(path : str, input_path : str = None, separator : bool = True, subbands : int = 1, aligned : bool = False, noise_dir : str = None, code : str = "crc", tones : int = 64, start_freq : int = 800, soft : bool = False) -> None:
+
+    receiver = Receiver(tone_base(subbands, tones), separator, subbands, aligned, start_freq)
+    if input_path is None:
+        source, sample_rate = None, 44100
+        calibrate(receiver, noise_dir)
+    else:
+        source = FileSource(input_path)
+        sample_rate = source.sample_rate
+
+    # Frames are decoded as they arrive, the payload is rebuilt once all of them were seen
+    reassembler = Reassembler(code = code)
+    try:
+        for seq in receiver.receive_frames(reassembler, sample_rate=sample_rate, bit_duration=0.3, source=source, soft=soft):
+            print(f"Frame {seq if seq is not None else '(uncorrectable)'} received, {reassembler.frames_seen}/{reassembler.total_frames()}")
+    except EOFError:
+        print("The recording ended before the end of the transmission")
+    if input_path is None and noise_dir is not None:
+        receiver.save_noise(noise_dir)
+
+    # A payload missing frames is useless, nothing is written
+    if not reassembler.complete():
+        missing = reassembler.missing()
+        print("Transmission lost, " + ("no frame could be decoded" if missing is None else f"missing frames {missing}") + f", nothing written to {path}")
+        return
+    payload = reassembler.payload()
+    with open(path, "wb") as file:
+        file.write(payload)
+    print(f"Received {len(payload)} bytes, written to {path}")
+
+def recv_streams(path : str, streams : int, input_path : str = None, separator : bool = True, subbands : int = 1, aligned : bool = False, code : str = "crc", tones : int = 64, start_freq : int = 800, soft : bool = False) -> None:
+
+    # Every sender transmits a file in its own band plan, they are all decoded at once from the same capture
+    plans = band_plans(streams, tone_base(subbands, tones), separator, subbands, start_freq)
+    for i, plan in enumerate(plans):
+        print(f"Band plan {i}: send with --start-freq {plan['start_freq']}, written to {path}.{i}")
+    if input_path is None:
+        source, sample_rate = None, 44100
+        input("Press Enter once the room is quiet, the first 1.5 seconds measure the noise ")
+    else:
+        source = FileSource(input_path)
+        sample_rate = source.sample_rate
+
+    receiver = MultiReceiver(plans, aligned, sample_rate)
+    for i, payload in enumerate(receiver.receive_frames(source, bit_duration=0.3, code=code, calibrate=input_path is None, soft=soft)):
+        if payload is None:
+            print(f"Band plan {i}: nothing received")
+            continue
+        with open(f"{path}.{i}", "wb") as file:
+            file.write(payload)
+        print(f"Band plan {i}: received {len(payload)} bytes, written to {path}.{i}")
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Provide the mode to be used (send/recv)")
     parser.add_argument('--send', action='store_true', default = False, help='Flag to send')
     parser.add_argument('--recv', action='store_true', default = False, help='Flag to receive')
+    parser.add_argument('--input', default = None, help='WAV recording to decode instead of the microphone (with --recv)')
+    parser.add_argument('--output', default = None, help='WAV file to write instead of playing the audio (with --send)')
+    parser.add_argument('--file', default = None, help='File to send (with --send) or to write the received payload to (with --recv), using the multi-frame protocol')
+    parser.add_argument('--no-separator', action='store_true', default = False, help='Drop the separator tone between symbols (must match on both ends)')
+    parser.add_argument('--subbands', type=int, default = 1, help='Send this many tones at once, each in its own subband (must match on both ends)')
+    parser.add_argument('--aligned', action='store_true', default = False, help='Synchronize by correlation and decode one aligned window per symbol (with --recv)')
+    parser.add_argument('--noise-profiles', default = None, help='Directory to load the noise profile of the microphone from instead of calibrating, and to save it to after receiving (with --recv)')
+    parser.add_argument('--code', choices = sorted(CODES), default = 'crc', help='Error correcting code: bit level CRC or Reed-Solomon over 6 bit symbols (must match on both ends)')
+    parser.add_argument('--tones', type=int, default = 64, help='Size of the tone grid shared by the subbands (must match on both ends)')
+    parser.add_argument('--start-freq', type=int, default = 800, help='Frequency of the lowest tone in Hz, to share the room with other senders (must match on both ends)')
+    parser.add_argument('--soft', action='store_true', default = False, help='Decode the CRC with the reliability of every bit (Chase decoding) instead of the syndrome lookup alone (with --recv)')
+    parser.add_argument('--streams', type=int, default = 1, help='Receive this many senders at once, each in its own band plan from --start-freq up (with --recv --file)')
+    parser.add_argument('--stats', nargs='?', const='-', default = None, help='Record per-stage latencies and counters, printed as JSON at exit or written to the given file')
     args = parser.parse_args()
-
-    if args.send:
-        send()
+    # The receiver reports its progress through logging
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    separator = not args.no_separator
+    subbands = args.subbands
+    STATS.enabled = args.stats is not None
+    if STATS.enabled:
+        # Written even when the reception fails, that is when the numbers matter most
+        atexit.register(STATS.save, None if args.stats == '-' else args.stats)
+
+    if args.streams > 1 and not (args.recv and args.file is not None):
+        raise AssertionError("--streams needs --recv and --file")
+    if args.send and args.file is not None:
+        send_file(args.file, output = args.output, separator = separator, subbands = subbands, code = args.code, tones = args.tones, start_freq = args.start_freq)
+    elif args.send:
+        send(output = args.output, separator = separator, subbands = subbands, code = args.code, tones = args.tones, start_freq = args.start_freq)
+    elif args.recv and args.streams > 1:
+        recv_streams(args.file, args.streams, input_path = args.input, separator = separator, subbands = subbands, aligned = args.aligned, code = args.code, tones = args.tones, start_freq = args.start_freq, soft = args.soft)
+    elif args.recv and args.file is not None:
+        recv_file(args.file, input_path = args.input, separator = separator, subbands = subbands, aligned = args.aligned, noise_dir = args.noise_profiles, code = args.code, tones = args.tones, start_freq = args.start_freq, soft = args.soft)
     elif args.recv:
-        recv()
+        recv(input_path = args.input, separator = separator, subbands = subbands, aligned = args.aligned, noise_dir = args.noise_profiles, code = args.code, tones = args.tones, start_freq = args.start_freq, soft = args.soft)
     else:
-        raise AssertionError("Please provide --send or --recv flag")
\ No newline at end of file
+        raise AssertionError("Please provide --send or --recv flag")
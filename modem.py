@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from receiver import Receiver
+from sender import Sender
+from framing import framePayload, Reassembler
+
+log = logging.getLogger(__name__)
+
+# Queued once the reception ended, None being the payload of a lost transmission
+CLOSED = object()
+
+class Modem:
+    """
+    Full duplex modem for asyncio services, sending and receiving framed payloads (see framing.py) at the same time.
+    The output stream and the capture are opened once and kept open, so a message costs its airtime only. Synthesis
+    and playback run in one executor thread and capture decoding runs continuously in another, so the event loop
+    never blocks on audio: `await modem.send(payload)` and `async for payload in modem.frames()` may run concurrently.
+    Both ends hear their own transmissions, so two modems talking at once must send in disjoint band plans, each
+    receiving in the plan of the other (see multistream.band_plans).
+    """
+
+    def __init__(self, base: int = 64, separator: bool = True, subbands: int = 1, aligned: bool = False, code: str = "crc",
+                 send_freq: int = 800, recv_freq: int = 800, sample_rate: int = 44100, bit_duration: float = 0.3,
+                 source = None, noise_dir: str = None):
+        """
+        Parameters:
+            base (int): Number of tones per subband, must match on both ends
+            separator (bool): Whether symbols are followed by the separator tone, must match on both ends
+            subbands (int): Number of tones sent at once, must match on both ends
+            aligned (bool): Whether the receiver synchronises by correlation, see Receiver
+            code (str): Error correcting code of the frames, a key of framing.CODES
+            send_freq (int): Frequency of the lowest tone sent, in Hz
+            recv_freq (int): Frequency of the lowest tone received, in Hz
+            sample_rate (int): Sampling rate in Hz
+            bit_duration (float): Duration of each symbol in seconds
+            source: Sample source to receive from instead of the microphone, e.g. a FileSource; frames() ends with it
+            noise_dir (str): Directory of the noise profiles to load instead of calibrating, and to save on close
+        """
+        self.sender = Sender(base, separator, subbands, send_freq)
+        self.receiver = Receiver(base, separator, subbands, aligned, recv_freq)
+        self.code = code
+        self.sample_rate = sample_rate
+        self.bit_duration = bit_duration
+        self.source = source
+        self.noise_dir = noise_dir
+        self.capture, self.audio = None, None
+        self.send_executor = ThreadPoolExecutor(1, thread_name_prefix="modem-send")
+        self.receive_executor = ThreadPoolExecutor(1, thread_name_prefix="modem-receive")
+        self.send_lock = asyncio.Lock()
+        self.received = asyncio.Queue()
+        self.receiving = None
+        self.closing = False
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """
+        Open the output stream and the capture, measure the noise and start receiving in the background.
+        """
+        loop = asyncio.get_running_loop()
+        open_output = loop.run_in_executor(self.send_executor, self.sender.open_output_stream, self.sample_rate)
+        await loop.run_in_executor(self.receive_executor, self.open_capture)
+        await open_output
+        self.receiving = loop.run_in_executor(self.receive_executor, self.receive_loop, loop)
+
+    def open_capture(self):
+        """
+        Open the capture (unless a source was given) and estimate its noise, in the receive thread.
+        """
+        if self.source is not None:
+            self.capture = self.source
+            return
+        self.capture, self.audio = self.receiver.open_capture(self.sample_rate)
+        if self.noise_dir is None or not self.receiver.load_noise(self.noise_dir, self.sample_rate):
+            self.receiver.calibrate(self.sample_rate, duration=0.03, source=self.capture)
+
+    def receive_loop(self, loop: asyncio.AbstractEventLoop):
+        """
+        Receive transmission after transmission until the capture ends, handing every payload to the event loop.
+        A lost transmission is handed over as None, and the receiver synchronises again on the next one.
+        """
+        try:
+            while not self.closing:
+                reassembler = Reassembler(code = self.code)
+                for _ in self.receiver.receive_frames(reassembler, self.sample_rate, self.bit_duration, source=self.capture):
+                    pass
+                if reassembler.complete():
+                    loop.call_soon_threadsafe(self.received.put_nowait, reassembler.payload())
+                else:
+                    log.info("Transmission lost, missing frames %s", reassembler.missing())
+                    loop.call_soon_threadsafe(self.received.put_nowait, None)
+        except EOFError:
+            pass
+        finally:
+            loop.call_soon_threadsafe(self.received.put_nowait, CLOSED)
+
+    async def send(self, payload: bytes):
+        """
+        Send a payload, returning once its last sample was handed to the audio device.
+        Concurrent calls are sent one after the other.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.send_lock:
+            await loop.run_in_executor(self.send_executor, self.send_frames, payload)
+
+    def send_frames(self, payload: bytes):
+        """
+        Frame, synthesize and play a payload, in the send thread.
+        """
+        symbols = self.sender.frame_symbols(framePayload(payload, code = self.code), self.sender.base)
+        self.sender.send_symbols(symbols, self.sample_rate, self.bit_duration)
+
+    async def frames(self):
+        """
+        Yield the payload of every transmission received, until the modem is closed or its source ends.
+        A lost transmission, some or all of its frames failing, yields None.
+        """
+        while True:
+            payload = await self.received.get()
+            if payload is CLOSED:
+                # Left in the queue for the next caller
+                self.received.put_nowait(CLOSED)
+                return
+            yield payload
+
+    async def close(self):
+        """
+        Stop receiving and release the audio devices.
+        """
+        loop = asyncio.get_running_loop()
+        self.closing = True
+        if self.audio is not None:
+            self.capture.finish()
+        if self.receiving is not None:
+            await self.receiving
+        async with self.send_lock:
+            await loop.run_in_executor(self.send_executor, self.sender.close)
+        if self.audio is not None:
+            self.capture.stop_stream()
+            self.capture.close()
+            self.audio.terminate()
+            if self.noise_dir is not None:
+                self.receiver.save_noise(self.noise_dir, self.sample_rate)
+        self.send_executor.shutdown()
+        self.receive_executor.shutdown()
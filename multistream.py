@@ -0,0 +1,229 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pyaudio
+from capture import SharedRing, RingReader
+from framing import Reassembler
+from receiver import Receiver
+from stats import STATS
+
+log = logging.getLogger(__name__)
+
+def band_plans(count: int, base: int, separator: bool = True, subbands: int = 1, start_freq: int = 800, guard: int = 400)-> list[dict]:
+    """
+    Consecutive disjoint band plans of identical senders, each starting `guard` Hz above the last tone of the previous one.
+
+    Parameters:
+        count (int): Number of band plans
+        base (int): Number of tones per subband of every plan
+        separator (bool): Whether the senders use the separator tone
+        subbands (int): Number of tones sent at once by every sender
+        start_freq (int): Frequency of the first tone of the first plan in Hz
+        guard (int): Gap between two plans in Hz, at least two tone spacings so their band filters do not overlap
+
+    Returns:
+        list[dict]: Keyword arguments of the Sender and the Receiver of every plan
+    """
+    span = 200 * base*subbands
+    return [{"base": base, "separator": separator, "subbands": subbands, "start_freq": start_freq + i*(span + guard)} for i in range(count)]
+
+def attach_receiver(plan: dict, reader_args: tuple, sample_rate: int, noise: np.ndarray = None, calibrate: bool = False):
+    """
+    Build the receiver of a band plan and attach it to the shared capture, in a worker process.
+    """
+    reader = RingReader(*reader_args)
+    receiver = Receiver(**plan)
+    if noise is not None:
+        receiver.noise_tracker.reset(noise, 50)
+    elif calibrate:
+        receiver.calibrate(sample_rate, duration=0.03, source=reader)
+    return receiver, reader
+
+def receive_channel(plan: dict, reader_args: tuple, sample_rate: int = 44100, bit_duration: float = 0.3, code: str = "crc", noise: np.ndarray = None, calibrate: bool = False, soft: bool = False):
+    """
+    Worker decoding the framed payload (see Receiver.receive_frames) sent in one band plan.
+
+    Returns:
+        bytes: The payload
+        np.ndarray: The noise estimate of the band plan at the end of the reception
+    """
+    receiver, reader = attach_receiver(plan, reader_args, sample_rate, noise, calibrate)
+    try:
+        reassembler = Reassembler(code = code)
+        for _ in receiver.receive_frames(reassembler, sample_rate, bit_duration, source=reader, soft=soft):
+            pass
+        return reassembler.payload(), receiver.noise
+    finally:
+        reader.close()
+
+def decode_channel(plan: dict, reader_args: tuple, sample_rate: int = 44100, bit_duration: float = 0.3, code: str = "crc", noise: np.ndarray = None, calibrate: bool = False, soft: bool = True):
+    """
+    Worker decoding the single message (see Receiver.decode_audio_to_bits) sent in one band plan.
+
+    Returns:
+        tuple: Length of the message, its bits after the preamble and their reliability
+    """
+    receiver, reader = attach_receiver(plan, reader_args, sample_rate, noise, calibrate)
+    try:
+        return receiver.decode_audio_to_bits(sample_rate, bit_duration, source=reader, soft=soft, code=code)
+    finally:
+        reader.close()
+
+def run_worker(worker, record_stats: bool, log_level: int, *args):
+    """
+    Run a worker in its process, returning the statistics it recorded (see stats.STATS) along with its result.
+    Its progress is logged at the level of the parent, spawned processes do not inherit the logging configuration.
+
+    Returns:
+        result: The result of the worker, or the exception it failed with
+        Stats: The statistics of the worker, None unless record_stats is set
+    """
+    logging.basicConfig(level=log_level, format="%(message)s")
+    STATS.enabled = record_stats
+    STATS.reset()
+    try:
+        result = worker(*args)
+    except Exception as error:
+        result = error
+    return result, (STATS if record_stats else None)
+
+
+class MultiReceiver:
+    """
+    Receiver of several senders transmitting at once in disjoint band plans, see band_plans.
+    A single capture (the microphone or a recording) is written into a SharedRing, and every band plan is detected
+    and decoded by its own Receiver in a pool of worker processes reading the ring in place, so the decoding of the
+    channels runs on as many cores as there are plans while the samples are captured and stored once.
+    """
+
+    def __init__(self, plans: list[dict], aligned: bool = False, sample_rate: int = 44100, capacity: float = 10.0):
+        """
+        Parameters:
+            plans (list[dict]): Keyword arguments of the Receiver of every band plan, e.g. from band_plans
+            aligned (bool): Whether every channel synchronises by correlation, see Receiver
+            sample_rate (int): Sampling rate in Hz
+            capacity (float): Seconds of audio the shared ring holds, the slowest channel may lag this far behind
+        """
+        self.plans = [dict(plan, aligned=aligned) for plan in plans]
+        bands = sorted((freq[0], freq[-1]) for freq in (Receiver(**plan).freq for plan in self.plans))
+        if any(low - high < 400 for (_, high), (low, _) in zip(bands, bands[1:])):
+            raise AssertionError("The band plans overlap, leave at least two tone spacings between them")
+        if bands[-1][1] + 100 >= sample_rate / 2:
+            raise AssertionError("The band plans exceed the Nyquist frequency")
+        self.sample_rate = sample_rate
+        self.capacity = int(sample_rate*capacity)
+        self.noise = [None] * len(plans)
+        self.ring = None
+
+    def feed(self, ring: SharedRing, source, stop: threading.Event, futures: list, block_size: int = 4096):
+        """
+        Copy a recording into the ring block by block, waiting for the slowest channel instead of dropping samples.
+        Nothing is written before every worker attached to the ring (or ended without attaching), so no channel misses
+        the start of the recording.
+        """
+        try:
+            while not all(attached or future.done() for attached, future in zip(ring.attached(), futures)):
+                if stop.wait(0.01):
+                    return
+            while not stop.is_set():
+                count = min(block_size, source.available())
+                if count == 0:
+                    break
+                ring.write(source.read_samples(count), block=True, stop=stop)
+        finally:
+            ring.finish()
+
+    def run(self, worker, source = None, bit_duration: float = 0.3, code: str = "crc", calibrate: bool = False, soft: bool = False)-> list:
+        """
+        Run a worker on every band plan over one shared capture.
+
+        Parameters:
+            worker: receive_channel or decode_channel
+            source: Recording to read from instead of the microphone, e.g. a FileSource (default: None)
+            bit_duration (float): Duration of each symbol in seconds
+            code (str): Error correcting code of the transmissions, a key of framing.CODES
+            calibrate (bool): Whether every channel measures its noise on the first samples (when no noise estimate was set)
+            soft (bool): Passed on to the worker, see Receiver.receive_frames and Receiver.decode_audio_to_bits
+
+        Returns:
+            list: The result of every band plan, or the exception it failed with
+        """
+        ring = SharedRing(self.capacity, len(self.plans))
+        self.ring = ring
+        stop = threading.Event()
+        audio, feeder = None, None
+        if source is None:
+            audio = pyaudio.PyAudio()
+            ring.stream = audio.open(format=pyaudio.paFloat32,
+                                     channels=1,
+                                     rate=self.sample_rate,
+                                     input=True,
+                                     frames_per_buffer=1024,
+                                     stream_callback=ring.callback)
+            ring.stream.start_stream()
+
+        results = []
+        try:
+            # One worker per band plan: the ring waits for every reader, so a plan left queued would stall the others.
+            # Workers are spawned rather than forked, the capture thread is running already
+            with ProcessPoolExecutor(len(self.plans), multiprocessing.get_context("spawn")) as pool:
+                futures = [pool.submit(run_worker, worker, STATS.enabled, logging.getLogger().getEffectiveLevel(), plan, ring.reader_args(i), self.sample_rate, bit_duration, code, self.noise[i], calibrate, soft)
+                           for i, plan in enumerate(self.plans)]
+                if source is not None:
+                    feeder = threading.Thread(target=self.feed, args=(ring, source, stop, futures), daemon=True)
+                    feeder.start()
+                for future in futures:
+                    try:
+                        result, stats = future.result()
+                    except Exception as error:
+                        result, stats = error, None
+                    results.append(result)
+                    if stats is not None:
+                        STATS.merge(stats)
+        finally:
+            stop.set()
+            ring.stop_stream()
+            if feeder is not None:
+                feeder.join()
+            if audio is not None:
+                audio.terminate()
+                capture = ring.stats()
+                log.info("Capture: %s", capture)
+                for name in ("overruns", "dropped_samples", "input_overflows"):
+                    STATS.count(f"capture_{name}", capture[name])
+            ring.close()
+        return results
+
+    def receive_frames(self, source = None, bit_duration: float = 0.3, code: str = "crc", calibrate: bool = False, soft: bool = False)-> list:
+        """
+        Receive the framed payload of every band plan, see Receiver.receive_frames.
+
+        Returns:
+            list[bytes]: The payload of every band plan, None for the plans which could not be received
+        """
+        payloads = []
+        for i, result in enumerate(self.run(receive_channel, source, bit_duration, code, calibrate, soft)):
+            if isinstance(result, Exception):
+                log.warning("Band plan %d failed: %r", i, result)
+                payloads.append(None)
+                continue
+            payloads.append(result[0])
+            self.noise[i] = result[1]
+        return payloads
+
+    def decode_audio_to_bits(self, source = None, bit_duration: float = 0.3, code: str = "crc", calibrate: bool = False)-> list:
+        """
+        Receive the single message of every band plan, see Receiver.decode_audio_to_bits.
+
+        Returns:
+            list[tuple]: (length, transmission, reliability) of every band plan, None for the plans which could not be received
+        """
+        messages = []
+        for i, result in enumerate(self.run(decode_channel, source, bit_duration, code, calibrate, soft=True)):
+            if isinstance(result, Exception):
+                log.warning("Band plan %d failed: %r", i, result)
+                result = None
+            messages.append(result)
+        return messages
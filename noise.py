@@ -0,0 +1,105 @@
+import os
+import re
+import numpy as np
+import pyaudio
+
+class NoiseTracker:
+    """
+    Running estimate of the ambient noise power of every tone band, kept up to date on the live stream.
+    Every analysed window updates an exponential moving average of the power of the bands that are idle in it. A window
+    holds at most `tones` tones (the separator, or one symbol tone per subband), so only its strongest `tones` bands
+    can be busy, and only when they stand `threshold` times above the estimate (or no estimate exists yet, so a tone
+    heard first is not taken for noise); they are skipped together with the bands next to them, which catch their
+    leakage. Everything else is noise, including a new hum quieter than the tones.
+    Until a band has seen 1/alpha windows its estimate is the plain mean of them, so a fresh tracker converges as fast
+    as a calibration would.
+    """
+
+    def __init__(self, freq, tones: int = 1, alpha: float = 0.02, threshold: float = 4.0):
+        """
+        Parameters:
+            freq (np.ndarray): Centre frequency of every tone band in Hz
+            tones (int): Number of tones sent at once
+            alpha (float): Weight of every new window in the moving average, 0 freezes the estimate
+            threshold (float): Power ratio above the estimate from which a band counts as busy
+        """
+        self.freq = np.asarray(freq, dtype=float)
+        self.tones = tones
+        self.alpha = alpha
+        self.threshold = threshold
+        self.power = np.zeros(len(self.freq))
+        self.counts = np.zeros(len(self.freq), dtype=int)
+
+    def reset(self, power: np.ndarray, count: int = 0):
+        """
+        Replace the estimate, e.g. by the result of a calibration.
+
+        Parameters:
+            power (np.ndarray): Noise power of every band
+            count (int): Number of windows the estimate stands for
+        """
+        self.power = np.array(power, dtype=float)
+        self.counts = np.full(len(self.freq), count, dtype=int)
+
+    def update(self, power: np.ndarray):
+        """
+        Fold the band powers of one window (or a (windows, bands) batch of windows) into the estimate.
+
+        Parameters:
+            power (np.ndarray): Power of every tone band, without noise subtraction
+        """
+        if self.alpha <= 0:
+            return
+        for window in np.atleast_2d(power):
+            tones = np.zeros(len(window), dtype=bool)
+            tones[np.argpartition(window, -self.tones)[-self.tones:]] = True
+            tones &= (self.counts == 0) | (window > self.threshold * self.power)
+            busy = tones.copy()
+            busy[1:] |= tones[:-1]
+            busy[:-1] |= tones[1:]
+            idle = ~busy
+            self.counts[idle] += 1
+            weight = np.maximum(self.alpha, 1 / self.counts[idle])
+            self.power[idle] += weight * (window[idle] - self.power[idle])
+
+    def save(self, path: str):
+        """
+        Write the estimate to an .npz file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(path, freq=self.freq, power=self.power, counts=self.counts)
+
+    def load(self, path: str)-> bool:
+        """
+        Replace the estimate by one written by save, if it exists and was measured on the same tone bands.
+
+        Returns:
+            bool: Whether the estimate was loaded
+        """
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as profile:
+            if not np.array_equal(profile["freq"], self.freq):
+                return False
+            self.power = profile["power"].astype(float)
+            self.counts = profile["counts"].astype(int)
+        return True
+
+def default_input_device()-> str:
+    """
+    Name of the default audio input device, which noise profiles are stored under.
+    """
+    audio = pyaudio.PyAudio()
+    try:
+        return audio.get_default_input_device_info()["name"]
+    finally:
+        audio.terminate()
+
+def profile_path(directory: str, device: str, sample_rate: int = 44100)-> str:
+    """
+    File holding the noise profile of a device at a sampling rate.
+    """
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", device).strip("_") or "default"
+    return os.path.join(directory, f"noise_{name}_{sample_rate}.npz")
@@ -2,77 +2,208 @@ import pyaudio
 import numpy as np
 from scipy import signal
 from crc import *
+from capture import CaptureRing
+from framing import Reassembler, CODES
+from sync import CorrelationSync
+from noise import NoiseTracker, default_input_device, profile_path
+from stats import STATS, instrument
 import math
+import logging
+
+# Progress of the reception, shown by main.py; silent in services embedding the receiver such as modem.Modem
+log = logging.getLogger(__name__)
 
 class Receiver:
-    def __init__(self, base):
+    def __init__(self, base, separator: bool = True, subbands: int = 1, aligned: bool = False, start_freq: int = 800):
         self.base= base
-        self.freq = np.arange(800, 800 + 200 * (self.base+1) , 200)
-        self.noise=np.array([0.0]*(self.base+1))
+        self.separator = separator
+        self.aligned = aligned
+        self.subbands = subbands
+        if subbands > 1 and not separator:
+            raise AssertionError("Multi-tone symbols need the separator tone")
+        self.symbol_bits = int(math.log2(self.base))*self.subbands
+        self.start_freq = start_freq
+        self.freq = np.arange(start_freq, start_freq + 200 * (self.base*self.subbands+1) , 200)
+        self.noise_tracker = NoiseTracker(self.freq, self.subbands)
+        self.band_filters = {}
+        self.capture = None
 
-    def open_audio_stream(self, sample_rate: int = 44100):
+    @property
+    def noise(self)-> np.ndarray:
         """
-        Open the audio stream.
-        
+        Current noise power estimate of every tone band, kept up to date by self.noise_tracker.
+        """
+        return self.noise_tracker.power
+
+    @noise.setter
+    def noise(self, power: np.ndarray):
+        self.noise_tracker.reset(power)
+
+    @instrument("device_open")
+    def open_capture(self, sample_rate: int = 44100, capacity: float = 5.0):
+        """
+        Open the audio stream in callback mode, capturing into a ring buffer on PyAudio's thread.
+        The ring is kept in self.capture so its overrun counters can be inspected.
+
         Parameters:
             sample_rate (int): Sampling rate in Hz
-        
+            capacity (float): Seconds of audio the ring can hold before the capture starts dropping samples
+
         Returns:
-            stream: The audio stream object
+            capture (CaptureRing): Ring buffer to read from, stands in for the stream
             audio: The audio object
         """
+        capture = CaptureRing(int(sample_rate*capacity))
         audio = pyaudio.PyAudio()
-        stream = audio.open(format=pyaudio.paFloat32,
-                            channels=1,
-                            rate=sample_rate,
-                            input=True,
-                            frames_per_buffer=1024)
-        return stream, audio
+        capture.stream = audio.open(format=pyaudio.paFloat32,
+                                    channels=1,
+                                    rate=sample_rate,
+                                    input=True,
+                                    frames_per_buffer=1024,
+                                    stream_callback=capture.callback)
+        capture.stream.start_stream()
+        self.capture = capture
+        return capture, audio
 
     def receive_audio(self, stream, duration: float, sample_rate: int = 44100)-> np.ndarray:
         """
         Receive an audio signal from the default audio input device.
 
         Parameters:
-            stream: The audio stream object
+            stream: The audio stream object, a CaptureRing or a FileSource
             duration (float): Duration of each signal in seconds
             sample_rate (int): Sampling rate in Hz
 
         Returns:
             np.ndarray: Numpy array containing the audio signal
         """
-        frames = []
-        for _ in range(0, int(sample_rate / 1024 * duration)):
-            data = stream.read(1024)
-            frames.append(data)
+        return self.receive_samples(stream, int(sample_rate / 1024 * duration) * 1024)
+
+    @instrument("receive_audio")
+    def receive_samples(self, stream, count: int)-> np.ndarray:
+        """
+        Receive a given number of samples.
+
+        Parameters:
+            stream: The audio stream object, a CaptureRing (see open_capture), a FileSource or a RingReader
+            count (int): Number of samples to read
+
+        Returns:
+            np.ndarray: Numpy array containing the audio signal
+        """
+        return stream.read_samples(count)
+
+    def band_filter(self, sample_rate: int = 44100, window_size: int = 1024):
+        """
+        Precompute everything needed to turn a window of samples into the power of each frequency band.
+        The result matches summing a scipy.signal.welch density spectrum over [freq-100, freq+100] for every band.
+
+        Parameters:
+            sample_rate (int): Sampling rate in Hz
+            window_size (int): Number of samples in each analysed window
+
+        Returns:
+            taper (np.ndarray): Hann window of one Welch segment
+            step (int): Hop between Welch segments
+            bands (np.ndarray): (bins, tones) matrix summing the scaled periodogram bins of every band
+        """
+        key = (sample_rate, window_size)
+        if key not in self.band_filters:
+            nperseg = min(256, window_size)
+            taper = signal.get_window('hann', nperseg)
+            freqs = np.fft.rfftfreq(nperseg, 1/sample_rate)
+            scale = np.full(len(freqs), 2/(sample_rate*np.sum(taper**2)))
+            scale[0] /= 2
+            if nperseg % 2 == 0:
+                scale[-1] /= 2
+            in_band = (freqs[:, None] >= self.freq-100) & (freqs[:, None] <= self.freq+100)
+            self.band_filters[key] = (taper, nperseg//2, in_band * scale[:, None])
+        return self.band_filters[key]
+
+    def band_power(self, segments: np.ndarray, sample_rate: int = 44100)-> np.ndarray:
+        """
+        Compute the power of every frequency band of one window, or of a batch of windows at once.
+
+        Parameters:
+            segments (np.ndarray): Window of samples, or (windows, samples) array of several windows
+            sample_rate (int): Sampling rate in Hz
 
-        return np.frombuffer(b''.join(frames), dtype=np.float32)
+        Returns:
+            np.ndarray: Power of each of the tone bands, with a leading windows axis for a batch
+        """
+        taper, step, bands = self.band_filter(sample_rate, np.shape(segments)[-1])
+        with STATS.stage("welch"):
+            frames = np.lib.stride_tricks.sliding_window_view(segments, len(taper), axis=-1)[..., ::step, :]
+            frames = frames - np.mean(frames, axis=-1, keepdims=True)
+            periodogram = np.mean(np.abs(np.fft.rfft(frames*taper, axis=-1))**2, axis=-2)
+        with STATS.stage("band_sum"):
+            return periodogram @ bands
 
-    def calibrate(self, sample_rate: int = 44100, duration: float = 0.03):
+    def frequency_power(self, segments: np.ndarray, sample_rate: int = 44100)-> np.ndarray:
+        """
+        Band powers of one window (or a batch of windows) with the noise estimate subtracted.
+        The windows are folded into the noise estimate as well, see NoiseTracker.
+
+        Parameters:
+            segments (np.ndarray): Window of samples, or (windows, samples) array of several windows
+            sample_rate (int): Sampling rate in Hz
+
+        Returns:
+            np.ndarray: Noise subtracted power of each of the tone bands
+        """
+        power = self.band_power(segments, sample_rate)
+        freq_power = np.abs(power - self.noise)
+        self.noise_tracker.update(power)
+        return freq_power
+
+    @instrument("calibration")
+    def calibrate(self, sample_rate: int = 44100, duration: float = 0.03, source = None):
         """
         Calculates the ambient noise power for each frequency range
 
         Parameters:
             sample_rate (int): Sampling rate in Hz
             duration (float): Duration of each measurement in seconds
+            source: Sample source to read from instead of the microphone, e.g. a FileSource (default: None)
 
         """
-        segment_size = int(sample_rate*duration)
         white_noise_sample_size = 50
 
-        stream, audio = self.open_audio_stream(sample_rate)
+        if source is not None:
+            segments = np.stack([np.array(self.receive_audio(source, duration, sample_rate)) for _ in range(white_noise_sample_size)])
+            self.noise_tracker.reset(np.mean(self.band_power(segments, sample_rate), axis=0), white_noise_sample_size)
+            return
+
+        stream, audio = self.open_capture(sample_rate)
 
-        for _ in range(0, segment_size*white_noise_sample_size, segment_size):
-            segment = self.receive_audio(stream, duration, sample_rate)
-            freqs, power = signal.welch(segment, sample_rate)
-            for i in range(self.base+1):
-                self.noise[i] += np.sum(power[(freqs >= self.freq[i]-100) & (freqs <= self.freq[i]+100)])
-        for i in range(self.base+1):
-            self.noise[i] = self.noise[i]/white_noise_sample_size
+        segments = np.stack([np.array(self.receive_audio(stream, duration, sample_rate)) for _ in range(white_noise_sample_size)])
+        self.noise_tracker.reset(np.mean(self.band_power(segments, sample_rate), axis=0), white_noise_sample_size)
         stream.stop_stream()
         stream.close()
         audio.terminate()
 
+    def load_noise(self, directory: str, sample_rate: int = 44100, device: str = None)-> bool:
+        """
+        Load the noise profile saved for an input device, making calibrate unnecessary.
+
+        Parameters:
+            directory (str): Directory holding the noise profiles
+            sample_rate (int): Sampling rate in Hz
+            device (str): Name of the input device (default: the default input device)
+
+        Returns:
+            bool: Whether a matching profile was found
+        """
+        device = device if device is not None else default_input_device()
+        return self.noise_tracker.load(profile_path(directory, device, sample_rate))
+
+    def save_noise(self, directory: str, sample_rate: int = 44100, device: str = None):
+        """
+        Save the current noise estimate as the profile of an input device, see load_noise.
+        """
+        device = device if device is not None else default_input_device()
+        self.noise_tracker.save(profile_path(directory, device, sample_rate))
+
     def index_to_bits(self, index : int)-> np.ndarray:
         """
         Convert an index to a list of bits.
@@ -88,7 +219,75 @@ class Receiver:
             bits=np.append(bits,int(index%2))
             index=index//2
         return bits[::-1].astype(int)
+
+    def symbol_to_bits(self, symbol)-> np.ndarray:
+        """
+        Convert a symbol yielded by receive_symbols, a tone index or one value per subband, to its bits.
+        Parameters:
+            symbol: Index of the detected tone, or tuple of the detected value (1 to base) of every subband
+
+        Returns:
+            bits (np.ndarray): Numpy array containing the symbol_bits bits
+        """
+        return np.concatenate([self.index_to_bits(value) for value in np.atleast_1d(symbol)])
+
+    def decide_subbands(self, freq_power: np.ndarray)-> tuple:
+        """
+        Decide the tone of every subband of a multi-tone symbol from the same analysis window.
+        Parameters:
+            freq_power (np.ndarray): Power of each of the tone bands
+
+        Returns:
+            tuple: The detected value (1 to base) of every subband
+        """
+        return tuple(np.argmax(freq_power[1:].reshape(self.subbands, self.base), axis=1) + 1)
+
+    def bit_reliability(self, freq_power: np.ndarray, symbol)-> np.ndarray:
+        """
+        Confidence of every bit of a symbol, as for symbol_to_bits.
+        The reliability of a bit is the log ratio of the power of the detected tone to the power of the strongest tone of
+        the same subband carrying the other value of that bit (max-log approximation of the bit likelihood ratio).
+        Parameters:
+            freq_power (np.ndarray): Power of each of the tone bands in the window the symbol was decided from
+            symbol: Index of the detected tone, or tuple of the detected value (1 to base) of every subband
+
+        Returns:
+            reliability (np.ndarray): Non negative reliability of each of the symbol_bits bits
+        """
+        labels = np.array([self.index_to_bits(value) for value in range(1, self.base+1)])
+        bands = np.maximum(freq_power[1:self.base*self.subbands+1].reshape(self.subbands, self.base), 1e-12)
+        reliability = []
+        for power, value in zip(bands, np.atleast_1d(symbol)):
+            other = labels != labels[value-1]
+            alternative = np.max(np.where(other, power[:, None], 1e-12), axis=0)
+            reliability.append(np.log(power[value-1] / alternative))
+        return np.maximum(np.concatenate(reliability), 0)
+
+    def tone_reliability(self, freq_power: np.ndarray, tone: int, previous: int)-> np.ndarray:
+        """
+        Confidence of the bits of a separator-free symbol: the log ratio of the power of the detected tone to the
+        strongest other tone besides the previous one. A wrong tone corrupts every bit of the symbol, so all of them
+        share that reliability.
+        """
+        power = np.maximum(np.nan_to_num(np.array(freq_power, dtype=float), neginf=0), 1e-12)
+        best = power[tone]
+        power[[tone, previous]] = 1e-12
+        return np.full(self.symbol_bits, max(np.log(best / np.max(power)), 0))
     
+    def record_symbol(self, freq_power: np.ndarray, tones):
+        """
+        Count a decided symbol and record the SNR of the band of each of its tones, see stats.STATS.
+
+        Parameters:
+            freq_power (np.ndarray): Noise subtracted power of each of the tone bands
+            tones: Indices into self.freq of the tones of the symbol
+        """
+        if not STATS.enabled:
+            return
+        STATS.count("symbols_decided")
+        for tone in tones:
+            STATS.observe("snr_db", 10*np.log10(freq_power[tone] / max(self.noise[tone], 1e-20) + 1e-12), key=int(self.freq[tone]))
+
     def preamble_check(self, preamble : np.ndarray)-> int:
         """
         Convert a preamble to an integer.
@@ -103,40 +302,61 @@ class Receiver:
             n=n*2+i
         return int(n)
 
-    def decode_audio_to_bits(self, sample_rate: int = 44100, bit_duration: float = 0.3):
+    def open_source(self, sample_rate: int = 44100, source = None):
         """
-        Decode an audio signal to a list of bits.
+        Return the stream to read from: the given source, or a freshly opened capture of the microphone.
+
+        Returns:
+            stream: A CaptureRing or the given source
+            audio: The audio object, None when a source was given
+        """
+        if source is None:
+            return self.open_capture(sample_rate)
+        return source, None
+
+    @instrument("device_close")
+    def close_source(self, stream, audio):
+        """
+        Stop and close a stream returned by open_source. A source given by the caller stays open, the caller may
+        receive the next transmission from it.
+        """
+        if audio is not None:
+            stream.stop_stream()
+            stream.close()
+            audio.terminate()
+        log.info("\n\nAudio reception complete: --------------------------------\n\n")
+        if isinstance(stream, CaptureRing):
+            capture = stream.stats()
+            log.info("Capture: %s", capture)
+            for name in ("overruns", "dropped_samples", "input_overflows"):
+                STATS.count(f"capture_{name}", capture[name])
+
+    @instrument("synchronize")
+    def synchronize(self, stream, sample_rate: int = 44100, bit_duration: float = 0.3):
+        """
+        Wait for the special sequence and skip to the start of the first symbol after it.
 
         Parameters:
+            stream: The stream to read from
             sample_rate (int): Sampling rate in Hz
             bit_duration (float): Duration of each bit in seconds
 
         Returns:
-            int: Length of the original message
-            list[int]: List of bits of the message after preamble
+            np.ndarray: With aligned reception, the samples already read past the special sequence (None otherwise)
         """
-        message_after_preamble = np.array([])
-        preamble = np.array([])
-        flag = 0
+        if self.aligned:
+            return self.synchronize_correlation(stream, sample_rate, bit_duration)
+
         switch_zero_count = 0
-        original_message_length = 0
-        transmitted_message_length = 0
         prev=1
-        
-        stream, audio = self.open_audio_stream(sample_rate)
-
-        print("Starting to receive audio: --------------------------------\n\n")  
 
         while True:
             segment = self.receive_audio(stream, bit_duration/10, sample_rate)
-            freq_power=np.array([0.0]*(self.base+1)) 
-            freqs, power = signal.welch(segment, sample_rate)
-            for i in range(self.base+1):
-                freq_power[i] = np.abs(np.sum(power[(freqs >= self.freq[i]-100) & (freqs <= self.freq[i]+100)]) - self.noise[i])
+            freq_power = self.frequency_power(segment, sample_rate)
 
             if freq_power[-1] >= np.max(freq_power[:-1]) and prev==0: 
                 if switch_zero_count >= 4:
-                    print("Special sequence ends. Now recieving preamble ... \n\n")  
+                    log.info("Special sequence ends. Now recieving preamble ... \n\n")  
                     break
                 else:
                     switch_zero_count = 0
@@ -152,42 +372,254 @@ class Receiver:
                 prev=np.argmax(freq_power) 
 
         self.receive_audio(stream, bit_duration*0.9, sample_rate)
-        prev = 0
+
+    def synchronize_correlation(self, stream, sample_rate: int = 44100, bit_duration: float = 0.3)-> np.ndarray:
+        """
+        Locate the end of the special sequence to the sample with a matched filter (see sync.CorrelationSync).
+
+        Parameters:
+            stream: The stream to read from
+            sample_rate (int): Sampling rate in Hz
+            bit_duration (float): Duration of each bit in seconds
+
+        Returns:
+            np.ndarray: The samples already read past the special sequence
+        """
+        special = [self.freq[1], self.freq[0]]*5 + [self.freq[-1], self.freq[0]]
+        guards = [self.freq[0] - 200, self.freq[-1] + 200]
+        detector = CorrelationSync(special, int(sample_rate*bit_duration/2), sample_rate, guards=guards)
+        while True:
+            samples = self.receive_samples(stream, 4096)
+            self.noise_tracker.update(self.band_power(samples, sample_rate))
+            remaining = detector.feed(samples)
+            if remaining is not None:
+                log.info("Special sequence ends. Now recieving preamble ... \n\n")
+                return remaining.astype(np.float32)
+
+    def tone_energy(self, samples: np.ndarray, tones, sample_rate: int = 44100)-> float:
+        """
+        Energy of the given tones in a short stretch of samples, a single DFT bin per tone.
+        """
+        phase = 2 * np.pi * np.outer(self.freq[list(tones)], np.arange(len(samples))) / sample_rate
+        return float(np.sum(np.abs(np.exp(-1j*phase) @ samples)**2))
+
+    def receive_aligned(self, stream, sample_rate: int = 44100, bit_duration: float = 0.3, leftover: np.ndarray = None, gain: float = 0.5):
+        """
+        Yield the symbols following the special sequence, deciding each one from a single window aligned on its tone.
+        Alignment is tracked with an early-late gate: the energy of the detected tone in the first and the last eighth
+        of its window tells whether the window starts early or late, and the next window is moved accordingly.
+
+        Parameters:
+            stream: The stream to read from
+            sample_rate (int): Sampling rate in Hz
+            bit_duration (float): Duration of each bit in seconds
+            leftover (np.ndarray): Samples read past the special sequence by synchronize
+            gain (float): Fraction of the measured timing error corrected after every symbol
+
+        Yields:
+            Same symbols as receive_symbols
+        """
+        tone_length = int(sample_rate*bit_duration/2)
+        period = 2*tone_length if self.separator else tone_length
+        edge = max(tone_length//8, 1)
+        buffer = leftover if leftover is not None else np.zeros(0, dtype=np.float32)
+        position = 0.0
+        tone = 0
+        while True:
+            start = int(round(position))
+            if len(buffer) < start + tone_length:
+                buffer = np.concatenate((buffer, self.receive_samples(stream, start + tone_length - len(buffer))))
+            window = buffer[start:start+tone_length]
+            freq_power = self.frequency_power(window[edge:tone_length-edge], sample_rate)
+
+            if not self.separator:
+                freq_power[tone] = -np.inf
+                tone, previous = int(np.argmax(freq_power)), tone
+                symbol, tones = (tone - previous - 1) % (self.base+1) + 1, [tone]
+                reliability = self.tone_reliability(freq_power, tone, previous)
+            elif self.subbands > 1:
+                symbol = self.decide_subbands(freq_power)
+                tones = [j*self.base + value for j, value in enumerate(symbol)]
+                reliability = self.bit_reliability(freq_power, symbol)
+            else:
+                symbol = int(np.argmax(freq_power[1:])) + 1
+                tones = [symbol]
+                reliability = self.bit_reliability(freq_power, symbol)
+
+            early = self.tone_energy(window[:edge], tones, sample_rate)
+            late = self.tone_energy(window[tone_length-edge:], tones, sample_rate)
+            position += period - gain * edge * (early - late) / (early + late + 1e-12)
+            self.record_symbol(freq_power, tones)
+            yield symbol, reliability
+
+            if start > 16*period:
+                buffer = buffer[start:]
+                position -= start
+
+    def receive_symbols(self, stream, sample_rate: int = 44100, bit_duration: float = 0.3, leftover: np.ndarray = None):
+        """
+        Yield every symbol received after synchronisation, detected on the separator to tone transition, with the
+        reliability of its bits.
+
+        Parameters:
+            stream: The stream to read from
+            sample_rate (int): Sampling rate in Hz
+            bit_duration (float): Duration of each bit in seconds
+            leftover (np.ndarray): Samples read past the special sequence, as returned by synchronize
+
+        Yields:
+            symbol: Index of the detected tone in self.freq, or tuple of the detected value of every subband
+            reliability (np.ndarray): Reliability of each of the symbol_bits bits, see bit_reliability
+        """
+        if self.aligned:
+            yield from self.receive_aligned(stream, sample_rate, bit_duration, leftover)
+            return
+        if not self.separator:
+            yield from self.receive_tone_changes(stream, sample_rate, bit_duration)
+            return
+
         max_ind = 0
         while True:
             prev = max_ind
-            max_ind = 0
             segment = self.receive_audio(stream, bit_duration/10, sample_rate)
-            freqs, power = signal.welch(segment, sample_rate)
-            for i in  range(self.base+1):
-                freq_power[i] = np.abs(np.sum(power[(freqs >= self.freq[i]-100) & (freqs <= self.freq[i]+100)]) - self.noise[i])
+            freq_power = self.frequency_power(segment, sample_rate)
             max_ind=np.argmax(freq_power)
-            
+
             if prev == 0 and max_ind != 0:
-                if not flag:
-                    if len(preamble)+int(math.log2(self.base))>=5:
-                        flag=1
-                        preamble = np.append(preamble, self.index_to_bits(max_ind)[0:5-len(preamble)])
-                        print("Preamble recieved. Now recieving message ... \n\n")
-                        original_message_length = self.preamble_check(preamble)
-                        transmitted_message_length = int(transmissionLength(original_message_length))
-
-                    else:
-                        preamble = np.append(preamble, self.index_to_bits(max_ind))
+                symbol = max_ind if self.subbands == 1 else self.decide_subbands(freq_power)
+                self.record_symbol(freq_power, [max_ind] if self.subbands == 1 else [j*self.base + value for j, value in enumerate(symbol)])
+                yield symbol, self.bit_reliability(freq_power, symbol)
+
+    def receive_tone_changes(self, stream, sample_rate: int = 44100, bit_duration: float = 0.3, confirm: int = 2):
+        """
+        Yield the symbols of a separator-free transmission (see Sender.never_repeat).
+        Every symbol is a change of tone, accepted once the new tone wins `confirm` windows in a row; the symbol is
+        the distance from the previous tone.
+
+        Parameters:
+            stream: The stream to read from
+            sample_rate (int): Sampling rate in Hz
+            bit_duration (float): Duration of each bit in seconds
+            confirm (int): Number of consecutive windows a new tone must be detected in
+
+        Yields:
+            int: Symbol in the same range as the tone indices yielded by receive_symbols
+            reliability (np.ndarray): Reliability of its bits, see tone_reliability
+        """
+        tone = 0
+        candidate, count = None, 0
+        while True:
+            segment = self.receive_audio(stream, bit_duration/10, sample_rate)
+            freq_power = self.frequency_power(segment, sample_rate)
+            max_ind = np.argmax(freq_power)
+
+            if max_ind == tone:
+                candidate = None
+                continue
+            if max_ind != candidate:
+                candidate, count = max_ind, 0
+            count += 1
+            if count >= confirm:
+                self.record_symbol(freq_power, [max_ind])
+                yield (max_ind - tone - 1) % (self.base+1) + 1, self.tone_reliability(freq_power, max_ind, tone)
+                tone, candidate = max_ind, None
+
+    def decode_audio_to_bits(self, sample_rate: int = 44100, bit_duration: float = 0.3, source = None, soft: bool = False, code: str = "crc"):
+        """
+        Decode an audio signal to a list of bits.
+
+        Parameters:
+            sample_rate (int): Sampling rate in Hz
+            bit_duration (float): Duration of each bit in seconds
+            source: Sample source to read from instead of the microphone, e.g. a FileSource (default: None)
+            soft (bool): Whether to return the reliability of every bit as well, for decodeCrcSoft
+            code (str): Error correcting code of the transmission, a key of framing.CODES
+
+        Returns:
+            int: Length of the original message
+            list[int]: List of bits of the message after preamble
+            list[float]: Reliability of every bit of the message after preamble, only if soft is set
+        """
+        message_after_preamble = np.array([])
+        reliability = np.array([])
+        preamble = np.array([])
+        flag = 0
+        original_message_length = 0
+        transmitted_message_length = 0
+        transmission_length = CODES[code][2]
+        
+        stream, audio = self.open_source(sample_rate, source)
+
+        log.info("Starting to receive audio: --------------------------------\n\n")  
+
+        leftover = self.synchronize(stream, sample_rate, bit_duration)
+        for max_ind, symbol_reliability in self.receive_symbols(stream, sample_rate, bit_duration, leftover):
+            if not flag:
+                if len(preamble)+self.symbol_bits>=5:
+                    flag=1
+                    preamble = np.append(preamble, self.symbol_to_bits(max_ind)[0:5-len(preamble)])
+                    log.info("Preamble recieved. Now recieving message ... \n\n")
+                    original_message_length = self.preamble_check(preamble)
+                    transmitted_message_length = int(transmission_length(original_message_length))
+
                 else:
-                    if len(message_after_preamble)+int(math.log2(self.base))>=transmitted_message_length:
-                        message_after_preamble = np.append(message_after_preamble, (self.index_to_bits(max_ind))[0:transmitted_message_length-len(message_after_preamble)])
-                        break
-                    else:
-                        message_after_preamble = np.append(message_after_preamble, self.index_to_bits(max_ind))
-        stream.stop_stream()
-        stream.close()
-        audio.terminate()
-        print("\n\nAudio reception complete: --------------------------------\n\n")
-        assert len(message_after_preamble) == transmissionLength(original_message_length)
+                    preamble = np.append(preamble, self.symbol_to_bits(max_ind))
+            else:
+                if len(message_after_preamble)+self.symbol_bits>=transmitted_message_length:
+                    reliability = np.append(reliability, symbol_reliability[0:transmitted_message_length-len(message_after_preamble)])
+                    message_after_preamble = np.append(message_after_preamble, (self.symbol_to_bits(max_ind))[0:transmitted_message_length-len(message_after_preamble)])
+                    break
+                else:
+                    reliability = np.append(reliability, symbol_reliability)
+                    message_after_preamble = np.append(message_after_preamble, self.symbol_to_bits(max_ind))
+        self.close_source(stream, audio)
+        assert len(message_after_preamble) == transmission_length(original_message_length)
         
-        print("Preamble: ",preamble)
-        print("Transmitted message after preamble:", message_after_preamble)
-        print(f"Original message length: {original_message_length}")
-        print(f"Transmitted message length after preamble: {len(message_after_preamble)}")
+        log.info("Preamble: %s", preamble)
+        log.info("Transmitted message after preamble: %s", message_after_preamble)
+        log.info("Original message length: %d", original_message_length)
+        log.info("Transmitted message length after preamble: %d", len(message_after_preamble))
+        if soft:
+            return original_message_length, list(message_after_preamble.astype(int)), list(reliability)
         return original_message_length, list(message_after_preamble.astype(int))
+
+    def receive_frames(self, reassembler: Reassembler, sample_rate: int = 44100, bit_duration: float = 0.3, source = None, max_failures: int = 2, soft: bool = False):
+        """
+        Receive a packetized transmission (see framing.py) under a single synchronisation, frame by frame.
+        Until a frame is decoded nothing tells how long the transmission is, so after max_failures frames failing in a
+        row it is given up as lost (reassembler.complete() stays False) rather than decoding noise forever.
+
+        Parameters:
+            reassembler (Reassembler): Collects the frames, also tells how many frames to expect
+            sample_rate (int): Sampling rate in Hz
+            bit_duration (float): Duration of each bit in seconds
+            source: Sample source to read from instead of the microphone, e.g. a FileSource (default: None)
+            max_failures (int): Number of frames which may fail before the frame count is known
+            soft (bool): Whether CRC frames are decoded with the reliability of every bit, see Reassembler.add_frame
+
+        Yields:
+            int: Sequence number of every frame received, None for a frame which could not be corrected
+        """
+        frame_symbols = math.ceil(reassembler.frame_length / self.symbol_bits)
+        symbols, reliability = [], []
+
+        stream, audio = self.open_source(sample_rate, source)
+        log.info("Starting to receive audio: --------------------------------\n\n")
+        try:
+            leftover = self.synchronize(stream, sample_rate, bit_duration)
+            for max_ind, symbol_reliability in self.receive_symbols(stream, sample_rate, bit_duration, leftover):
+                symbols.append(max_ind)
+                reliability.append(symbol_reliability)
+                if len(symbols) < frame_symbols:
+                    continue
+                frame = np.concatenate([self.symbol_to_bits(symbol) for symbol in symbols])[:reassembler.frame_length]
+                frame_reliability = np.concatenate(reliability)[:reassembler.frame_length] if soft else None
+                symbols, reliability = [], []
+                yield reassembler.add_frame([int(bit) for bit in frame], frame_reliability)
+                if reassembler.done():
+                    break
+                # Every frame so far failed while the count is unknown
+                if reassembler.total_frames() is None and reassembler.failed_frames >= max_failures:
+                    break
+        finally:
+            self.close_source(stream, audio)
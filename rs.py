@@ -0,0 +1,240 @@
+import math
+from functools import lru_cache
+from stats import STATS, instrument
+
+SYMBOL_BITS = 6
+FIELD_POLY = 0x43
+BLOCK_SYMBOLS = (1 << SYMBOL_BITS) - 1
+
+@lru_cache(maxsize = 1)
+def gfTables() :
+    '''
+        Builds the exponential and logarithm tables of GF(64) generated by the primitive polynomial x^6 + x + 1
+        Returns:
+            (exp, log) (tuple[list[int]]): 'exp[i]' is alpha^i, repeated twice so that sums of two logarithms need no reduction, 'log[a]' is the logarithm of the non zero element a
+    '''
+    exp = [0] * (2 * BLOCK_SYMBOLS)
+    log = [0] * (BLOCK_SYMBOLS + 1)
+    value = 1
+    for i in range(BLOCK_SYMBOLS):
+        exp[i] = exp[i + BLOCK_SYMBOLS] = value
+        log[value] = i
+        value <<= 1
+        if value >> SYMBOL_BITS:
+            value ^= FIELD_POLY
+    return exp, log
+
+def gfMultiply(a : int, b : int) -> int:
+    '''
+        Returns the product of two elements of GF(64)
+    '''
+    if a == 0 or b == 0:
+        return 0
+    exp, log = gfTables()
+    return exp[log[a] + log[b]]
+
+def gfInverse(a : int) -> int:
+    '''
+        Returns the multiplicative inverse of a non zero element of GF(64)
+    '''
+    exp, log = gfTables()
+    return exp[(BLOCK_SYMBOLS - log[a]) % BLOCK_SYMBOLS]
+
+def polyEvaluate(poly, x : int) -> int:
+    '''
+        Evaluates a polynomial over GF(64) given highest degree coefficient first, using Horner's scheme
+    '''
+    value = 0
+    for coefficient in poly:
+        value = gfMultiply(value, x) ^ coefficient
+    return value
+
+@lru_cache(maxsize = 8)
+def generatorPoly(parity : int) :
+    '''
+        Returns the generator polynomial (x - alpha)(x - alpha^2)...(x - alpha^parity), highest degree coefficient first
+        Parameters:
+            parity (int): The number of parity symbols of a codeword
+        Returns:
+            generator (tuple[int]): The parity + 1 coefficients of the polynomial, the leading one being 1
+    '''
+    exp, _ = gfTables()
+    generator = [1]
+    for i in range(1, parity + 1):
+        shifted = generator + [0]
+        for j in range(len(generator)):
+            shifted[j + 1] ^= gfMultiply(generator[j], exp[i])
+        generator = shifted
+    return tuple(generator)
+
+def blockSizes(symbols : int, parity : int) :
+    '''
+        Splits a message into the fewest codewords of at most 63 symbols, sharing the message symbols out evenly
+        Parameters:
+            symbols (int): The number of message symbols
+            parity (int): The number of parity symbols of every codeword
+        Returns:
+            sizes (list[int]): The number of message symbols of every codeword
+    '''
+    if parity >= BLOCK_SYMBOLS:
+        raise AssertionError("Too many parity symbols for a GF(64) Reed-Solomon codeword")
+    blocks = max(1, math.ceil(symbols / (BLOCK_SYMBOLS - parity)))
+    return [symbols // blocks + (i < symbols % blocks) for i in range(blocks)]
+
+def rsTransmissionLength(original_length : int, error_symbols : int = 2) -> int:
+    '''
+        Returns the length of the transmission after adding Reed-Solomon redundancy
+        Parameters:
+            original_length (int): The length of the original message in bits
+            error_symbols (int): The number of symbol errors corrected in every codeword (Default value 2)
+        Returns:
+            transmission_length (int): The length of the transmission in bits, a multiple of SYMBOL_BITS
+    '''
+    symbols = math.ceil(original_length / SYMBOL_BITS)
+    return SYMBOL_BITS * (symbols + 2 * error_symbols * len(blockSizes(symbols, 2 * error_symbols)))
+
+def encodeRs(message, error_symbols : int = 2) :
+    '''
+        Encodes the given message with a systematic Reed-Solomon code over GF(64)
+        The bits are grouped into 6 bit symbols (the last one padded with zeros), so every tone of a base 64 transmission carries exactly one symbol; messages longer than a codeword are split into several codewords sent back to back
+        Parameters:
+            message (list[int]): The bit stream message to be encoded
+            error_symbols (int): The number of symbol errors corrected in every codeword (Default value 2)
+        Returns:
+            encoding (list[int]): The message symbols followed by the parity symbols of every codeword, as bits
+    '''
+    parity = 2 * error_symbols
+    bits = [int(bit) for bit in message]
+    bits += [0] * (-len(bits) % SYMBOL_BITS)
+    symbols = [bitsToSymbol(bits[i:i+SYMBOL_BITS]) for i in range(0, len(bits), SYMBOL_BITS)]
+    generator = generatorPoly(parity)
+    encoding = []
+    start = 0
+    for size in blockSizes(len(symbols), parity):
+        block = symbols[start:start+size]
+        start += size
+        remainder = [0] * parity
+        for symbol in block:
+            feedback = symbol ^ remainder[0]
+            remainder = remainder[1:] + [0]
+            for j in range(parity):
+                remainder[j] ^= gfMultiply(generator[j + 1], feedback)
+        for symbol in block + remainder:
+            encoding += symbolToBits(symbol)
+    return encoding
+
+def bitsToSymbol(bits) -> int:
+    '''
+        Returns the GF(64) symbol of SYMBOL_BITS bits, most significant first
+    '''
+    symbol = 0
+    for bit in bits:
+        symbol = 2 * symbol + int(bit)
+    return symbol
+
+def symbolToBits(symbol : int) :
+    '''
+        Inverse of bitsToSymbol
+    '''
+    return [(symbol >> i) & 1 for i in range(SYMBOL_BITS - 1, -1, -1)]
+
+def berlekampMassey(syndromes) :
+    '''
+        Finds the shortest LFSR generating the syndromes, whose connection polynomial is the error locator
+        Parameters:
+            syndromes (list[int]): The syndromes S_1 ... S_2t of the received codeword
+        Returns:
+            locator (list[int]): The error locator polynomial, lowest degree coefficient first, locator[0] being 1
+    '''
+    locator, previous = [1], [1]
+    length, shift, last_discrepancy = 0, 1, 1
+    for n in range(len(syndromes)):
+        discrepancy = syndromes[n]
+        for i in range(1, length + 1):
+            if i < len(locator):
+                discrepancy ^= gfMultiply(locator[i], syndromes[n - i])
+        if discrepancy == 0:
+            shift += 1
+            continue
+        scale = gfMultiply(discrepancy, gfInverse(last_discrepancy))
+        updated = locator + [0] * max(0, len(previous) + shift - len(locator))
+        for i in range(len(previous)):
+            updated[i + shift] ^= gfMultiply(scale, previous[i])
+        if 2 * length <= n:
+            previous, length, last_discrepancy, shift = locator, n + 1 - length, discrepancy, 1
+        else:
+            shift += 1
+        locator = updated
+    while len(locator) > 1 and locator[-1] == 0:
+        locator.pop()
+    return locator
+
+def decodeBlock(block, parity : int) :
+    '''
+        Corrects up to parity/2 symbol errors of a single codeword (Berlekamp-Massey, Chien search and Forney's algorithm)
+        Parameters:
+            block (list[int]): The received symbols of the codeword, first transmitted first
+            parity (int): The number of parity symbols of the codeword
+        Returns:
+            corrected (list[int]): The corrected symbols of the codeword
+    '''
+    exp, log = gfTables()
+    n = len(block)
+    syndromes = [polyEvaluate(block, exp[i]) for i in range(1, parity + 1)]
+    if not any(syndromes):
+        return list(block)
+    locator = berlekampMassey(syndromes)
+    errors = len(locator) - 1
+    if 2 * errors > parity:
+        raise AssertionError(f"RS Decoding Error, more than {parity // 2} symbol errors in a codeword!")
+
+    # Chien search over the n positions of the (possibly shortened) codeword, position j has degree n-1-j
+    positions = []
+    for j in range(n):
+        inverse = exp[(BLOCK_SYMBOLS - (n - 1 - j)) % BLOCK_SYMBOLS]
+        if polyEvaluate(locator[::-1], inverse) == 0:
+            positions.append(j)
+    if len(positions) != errors:
+        raise AssertionError(f"RS Decoding Error, the error locator has {len(positions)} roots in the codeword instead of {errors}!")
+
+    # Forney: with the first consecutive root alpha^1, the error value is Omega(X^-1) / Lambda'(X^-1)
+    evaluator = [0] * parity
+    for i, syndrome in enumerate(syndromes):
+        for j, coefficient in enumerate(locator):
+            if i + j < parity:
+                evaluator[i + j] ^= gfMultiply(syndrome, coefficient)
+    derivative = [locator[i] if i % 2 == 1 else 0 for i in range(1, len(locator))]
+    corrected = list(block)
+    for j in positions:
+        inverse = exp[(BLOCK_SYMBOLS - (n - 1 - j)) % BLOCK_SYMBOLS]
+        denominator = polyEvaluate(derivative[::-1], inverse)
+        if denominator == 0:
+            raise AssertionError("RS Decoding Error, repeated root of the error locator!")
+        corrected[j] ^= gfMultiply(polyEvaluate(evaluator[::-1], inverse), gfInverse(denominator))
+    STATS.count("rs_corrected_symbols", len(positions))
+    return corrected
+
+@instrument("rs_decode")
+def decodeRs(transmission, bits : int, error_symbols : int = 2) :
+    '''
+        Decodes the given Reed-Solomon transmission, detects and corrects symbol errors
+        A misdetected tone of a base 64 transmission is a single symbol error however many of its bits are wrong; the decoding cost is polynomial in the number of symbols
+        Parameters:
+            transmission (list[int]): The bit stream message received after the preamble
+            bits (int): Denotes the size of the original message without the redundancy, this is obtained from preamble
+            error_symbols (int): The number of symbol errors corrected in every codeword (Default value 2)
+        Returns:
+            decoded (list[int]): The original message without any redundancy and errors
+    '''
+    parity = 2 * error_symbols
+    if len(transmission) != rsTransmissionLength(bits, error_symbols):
+        raise AssertionError(f"Expected a transmission of {rsTransmissionLength(bits, error_symbols)} bits, got {len(transmission)}")
+    symbols = [bitsToSymbol(transmission[i:i+SYMBOL_BITS]) for i in range(0, len(transmission), SYMBOL_BITS)]
+    decoded = []
+    start = 0
+    for size in blockSizes(math.ceil(bits / SYMBOL_BITS), parity):
+        corrected = decodeBlock(symbols[start:start+size+parity], parity)
+        start += size + parity
+        for symbol in corrected[:size]:
+            decoded += symbolToBits(symbol)
+    return decoded[:bits]
@@ -1,12 +1,26 @@
 import numpy as np
 import pyaudio
 import math
+import queue
+from scipy.io import wavfile
+from stats import STATS, instrument
 
 class Sender:
 
-    def __init__(self, base):
+    def __init__(self, base, separator: bool = True, subbands: int = 1, start_freq: int = 800):
         self.base = base
-        self.frequencies = np.arange(800, 800 + 200 * (self.base+1) , 200)
+        self.separator = separator
+        self.subbands = subbands
+        if subbands > 1 and not separator:
+            raise AssertionError("Multi-tone symbols need the separator tone")
+        self.start_freq = start_freq
+        self.frequencies = np.arange(start_freq, start_freq + 200 * (self.base*self.subbands+1) , 200)
+        if self.frequencies[-1] >= 20000:
+            raise AssertionError("Too many tones for the audible band, reduce base or subbands")
+        self.tone_banks = {}
+        self.audio = None
+        self.stream = None
+        self.sending = False
 
     def generate_waves(self, frequency: int, duration: float, sample_rate: int = 44100, amplitude: float=1) -> np.ndarray:
         '''
@@ -23,27 +37,148 @@ class Sender:
         wave = amplitude * np.sin(2 * np.pi * frequency * t)
         return wave
     
+    def tone_bank(self, duration: float, sample_rate: int = 44100, amplitude: float = 1) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Return the sine and cosine waves of every frequency for the given tone duration, computing them only once.
+        Parameters:
+            duration (float): Duration of each tone in seconds
+            sample_rate (int): Sampling rate in Hz (default: 44100)
+            amplitude (float): Amplitude of the wave (0.0 to 1.0, default: 1)
+        Returns:
+            sines (np.ndarray): float32 array of shape (tones, samples), row i is the tone of self.frequencies[i]
+            cosines (np.ndarray): float32 array of the same shape, used to shift the phase of the tones
+        '''
+        key = (sample_rate, duration, amplitude)
+        if key not in self.tone_banks:
+            t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
+            phase = 2 * np.pi * self.frequencies[:, None] * t
+            self.tone_banks[key] = ((amplitude * np.sin(phase)).astype(np.float32), (amplitude * np.cos(phase)).astype(np.float32))
+        return self.tone_banks[key]
+
+    @instrument("synthesis")
+    def synthesize(self, symbols: np.ndarray, sample_rate: int = 44100, duration: float = 0.3, amplitude: float = 1, phase_continuous: bool = False, phase: float = 0.0) -> np.ndarray:
+        '''
+        Synthesize the audio signal of a sequence of symbols, every symbol tone being followed by the separator tone
+        unless the sender was created with separator=False. Multi-tone symbols (rows of a 2-D array) play all of
+        their tones at once, each at amplitude/subbands.
+        Parameters:
+            symbols (np.ndarray): Indices into self.frequencies, one per symbol, or one row of indices per symbol
+            sample_rate (int): Sampling rate in Hz
+            duration (float): Duration of each symbol (tone and separator) in seconds, tones last duration/2 in both modes
+            amplitude (float): Amplitude of the wave
+            phase_continuous (bool): Start every tone at the phase the previous one ended with, avoiding clicks at the joins
+            phase (float): Phase of the first tone when phase_continuous is set, one per column for multi-tone symbols
+        Returns:
+            audio_signal (np.ndarray): float32 numpy array containing the audio signal
+        '''
+        sines, cosines = self.tone_bank(duration/2, sample_rate, amplitude)
+        symbols = np.asarray(symbols, dtype=int)
+        STATS.count("symbols_synthesized", len(symbols))
+        samples = sines.shape[1]
+        if self.separator:
+            tones = np.zeros((len(symbols), 2) + symbols.shape[1:], dtype=int)
+            tones[:, 0] = symbols
+            tones = tones.reshape((-1,) + symbols.shape[1:])
+        else:
+            tones = symbols
+
+        if tones.ndim > 1:
+            return self.synthesize_chords(tones, sines, cosines, sample_rate, phase_continuous, phase)
+
+        audio_signal = np.empty((len(tones), samples), dtype=np.float32)
+        if phase_continuous:
+            advance = 2 * np.pi * self.frequencies[tones] * samples / sample_rate
+            start = (phase + np.concatenate(([0.0], np.cumsum(advance)[:-1]))) % (2 * np.pi)
+            np.multiply(sines[tones], np.cos(start).astype(np.float32)[:, None], out=audio_signal)
+            audio_signal += cosines[tones] * np.sin(start).astype(np.float32)[:, None]
+        else:
+            np.take(sines, tones, axis=0, out=audio_signal)
+        return audio_signal.reshape(-1)
+
+    def synthesize_chords(self, tones: np.ndarray, sines: np.ndarray, cosines: np.ndarray, sample_rate: int, phase_continuous: bool, phase) -> np.ndarray:
+        '''
+        Synthesize rows of simultaneous tones, the multi-tone counterpart of the gather in synthesize.
+        Parameters:
+            tones (np.ndarray): (tones, subbands) indices into self.frequencies
+            sines, cosines (np.ndarray): Tone bank, see tone_bank
+            sample_rate (int): Sampling rate in Hz
+            phase_continuous (bool): Start every tone at the phase the previous tone of its column ended with
+            phase (np.ndarray): Phase of the first tone of every column when phase_continuous is set
+        Returns:
+            audio_signal (np.ndarray): float32 numpy array containing the audio signal
+        '''
+        samples = sines.shape[1]
+        audio_signal = np.zeros((len(tones), samples), dtype=np.float32)
+        if phase_continuous:
+            advance = 2 * np.pi * self.frequencies[tones] * samples / sample_rate
+            start = (phase + np.concatenate((np.zeros((1, tones.shape[1])), np.cumsum(advance, axis=0)[:-1]))) % (2 * np.pi)
+        for column in range(tones.shape[1]):
+            if phase_continuous:
+                audio_signal += sines[tones[:, column]] * np.cos(start[:, column]).astype(np.float32)[:, None]
+                audio_signal += cosines[tones[:, column]] * np.sin(start[:, column]).astype(np.float32)[:, None]
+            else:
+                audio_signal += sines[tones[:, column]]
+        audio_signal /= tones.shape[1]
+        return audio_signal.reshape(-1)
+
     def convert_list(self, message: list[int], base : int) -> np.ndarray:
         """
         Convert a list of bits to a list of integers.
+        With several subbands every row holds one tone index per subband, subband j using tones j*base+1 to (j+1)*base.
         Parameters:
             message (list[int]): List of bits
             base (int): Base to convert the bits to
         Returns:
             converted_array (np.ndarray): Numpy array containing the converted integers
         """
-        converted_array = np.array([])
-        message=np.array(message)
+        message=np.array(message, dtype=int)
         n=int(math.log2(base))
-        if len(message)%n != 0:
-            message = np.append(message, np.zeros(n - len(message)%n))
-        for i in range(0, len(message), n):
-            num = 0
-            for j in range(0, n):
-                num += message[i+j]*(2**(n-j-1))
-            converted_array = np.append(converted_array, int(num)+1)
+        slot=n*self.subbands
+        if len(message)%slot != 0:
+            message = np.append(message, np.zeros(slot - len(message)%slot, dtype=int))
+        weights = 2**np.arange(n-1, -1, -1)
+        converted_array = message.reshape(-1, n) @ weights + 1
+        if self.subbands > 1:
+            converted_array = converted_array.reshape(-1, self.subbands) + base*np.arange(self.subbands)
+
+        return converted_array.astype(float)
 
-        return converted_array
+    def special_sequence(self) -> np.ndarray:
+        """
+        The synchronisation sequence starting every transmission. Without separators the separator tones are spelled
+        out, so the sequence sounds the same in both modes.
+        Returns:
+            special (np.ndarray): Numpy array containing the tone indices of the sequence
+        """
+        if not self.separator:
+            return np.array([1,0,1,0,1,0,1,0,1,0,-1,0])
+        if self.subbands > 1:
+            return np.repeat(np.array([[1],[1],[1],[1],[1],[-1]]), self.subbands, axis=1)
+        return np.array([1,1,1,1,1,-1])
+
+    def never_repeat(self, symbols: np.ndarray) -> np.ndarray:
+        """
+        Map symbols to tones differentially so that no tone is ever repeated, which lets the receiver find symbol
+        boundaries without separators. Symbol s (1 to base) moves s tones up from the previous tone, modulo base+1;
+        the tone before the first symbol is the separator tone ending the special sequence.
+        Parameters:
+            symbols (np.ndarray): Symbols as returned by convert_list
+        Returns:
+            tones (np.ndarray): Numpy array containing the tone indices
+        """
+        return (np.cumsum(np.asarray(symbols, dtype=int)) % (self.base+1)).astype(float)
+
+    def arrange(self, symbols: np.ndarray) -> np.ndarray:
+        """
+        Prefix data symbols with the special sequence, mapping them to tones for the selected mode.
+        Parameters:
+            symbols (np.ndarray): Symbols as returned by convert_list
+        Returns:
+            transmission (np.ndarray): Numpy array containing the tone indices of the whole transmission
+        """
+        if not self.separator:
+            symbols = self.never_repeat(symbols)
+        return np.concatenate((self.special_sequence(), symbols))
 
     def change_base(self, message: list[int], base:int = 2) -> np.ndarray:
         """
@@ -55,12 +190,24 @@ class Sender:
             transmission (np.ndarray): Numpy array containing the converted integers
         """
 
-        transmission=np.array([1,1,1,1,1,-1])                                           # special sequence
-        transmission = np.append(transmission, self.convert_list(message[0:5], base))   # preamble
-        transmission = np.append(transmission, self.convert_list(message[5:], base))    # tranmission message
-        return transmission
+        transmission = self.convert_list(message[0:5], base)                            # preamble
+        transmission = np.concatenate((transmission, self.convert_list(message[5:], base))) # tranmission message
+        return self.arrange(transmission)                                               # special sequence
 
-    def encode_bits_to_audio(self, bits: np.ndarray, sample_rate: int = 44100, duration: float = 0.3, amplitude: float =1)-> np.ndarray:
+    def frame_symbols(self, frames: list[list[int]], base: int = 2) -> np.ndarray:
+        """
+        Convert packetized frames (see framing.py) to a single transmission, the special sequence once and every frame after it.
+        Every frame starts on a fresh symbol so the receiver can split the symbols back into frames.
+        Parameters:
+            frames (list[list[int]]): The encoded frames
+            base (int): Base to convert the bits to
+        Returns:
+            transmission (np.ndarray): Numpy array containing the converted integers
+        """
+        transmission = [self.convert_list(frame, base) for frame in frames]
+        return self.arrange(np.concatenate(transmission))                               # special sequence
+
+    def encode_bits_to_audio(self, bits: np.ndarray, sample_rate: int = 44100, duration: float = 0.3, amplitude: float =1, phase_continuous: bool = False)-> np.ndarray:
         """
         Encode a list of bits into an audio signal.
         Parameters:
@@ -68,36 +215,156 @@ class Sender:
             sample_rate (int): Sampling rate in Hz
             duration (float): Duration of each signal in seconds
             amplitude (float): Amplitude of the wave
+            phase_continuous (bool): Join consecutive tones without a phase jump
         Returns
-            audio_signal (np.ndarray): Numpy array containing the audio signal
+            audio_signal (np.ndarray): float32 numpy array containing the audio signal
         """
-        audio_signal = np.array([])
-        
         tranmission_msg_in_changed_base = self.change_base(bits, self.base)
+        return self.synthesize(tranmission_msg_in_changed_base, sample_rate, duration, amplitude, phase_continuous)
+
+
+    def synthesize_lazily(self, symbols, sample_rate: int = 44100, duration: float = 0.3, amplitude: float = 1, phase_continuous: bool = False):
+        '''
+        Synthesize the audio of an iterable of symbols one symbol (tone and separator) at a time.
+        Parameters:
+            symbols (Iterable[int]): Indices into self.frequencies, consumed lazily
+            sample_rate (int): Sampling rate in Hz
+            duration (float): Duration of each symbol (tone and separator) in seconds
+            amplitude (float): Amplitude of the wave
+            phase_continuous (bool): Join consecutive tones without a phase jump
+        Yields:
+            audio_signal (np.ndarray): float32 numpy array containing the audio of one symbol
+        '''
+        phase = np.zeros(self.subbands) if self.subbands > 1 else 0.0
+        samples = int(sample_rate * duration / 2)
+        for symbol in symbols:
+            yield self.synthesize([symbol], sample_rate, duration, amplitude, phase_continuous, phase)
+            if phase_continuous:
+                frequency = self.frequencies[np.asarray(symbol, dtype=int)] + (self.frequencies[0] if self.separator else 0)
+                phase = (phase + 2 * np.pi * frequency * samples / sample_rate) % (2 * np.pi)
+
+    def open_output_stream(self, sample_rate: int = 44100, chunk_size: int = 2048, ring_size: int = 8):
+        """
+        Open a long lived, callback driven output stream fed from a ring of float32 chunk buffers.
+        Does nothing if the stream is already open with the same parameters.
+        Parameters:
+            sample_rate (int): Sampling rate in Hz
+            chunk_size (int): Number of samples per chunk handed to the audio device
+            ring_size (int): Number of chunk buffers, bounds the amount of audio queued ahead of playback
+        """
+        if self.stream is not None:
+            if (self.stream_sample_rate, self.chunk_size, len(self.ring)) == (sample_rate, chunk_size, ring_size):
+                return
+            self.close()
+
+        self.stream_sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.ring = np.zeros((ring_size, chunk_size), dtype=np.float32)
+        self.free_chunks = queue.Queue()
+        self.filled_chunks = queue.Queue()
+        for index in range(ring_size):
+            self.free_chunks.put(index)
+        self.pending_chunk = None
+        self.pending_fill = 0
+        self.silence = bytes(4 * chunk_size)
+
+        # Timed here rather than per call, every message calls this while the stream is usually open already
+        with STATS.stage("device_open"):
+            self.audio = pyaudio.PyAudio()
+            self.stream = self.audio.open(format=pyaudio.paFloat32,
+                                          channels=1,
+                                          rate=sample_rate,
+                                          output=True,
+                                          frames_per_buffer=chunk_size,
+                                          stream_callback=self.playback_callback)
+            self.stream.start_stream()
 
-        for i in tranmission_msg_in_changed_base:
-            audio_signal = np.append(audio_signal, self.generate_waves(self.frequencies[int(i)], duration/2, sample_rate, amplitude))
-            audio_signal = np.append(audio_signal, self.generate_waves(self.frequencies[0], duration/2, sample_rate, amplitude))
-        return audio_signal
+    def playback_callback(self, in_data, frame_count, time_info, status):
+        """
+        PyAudio callback handing the next filled chunk to the device, or silence if none is queued.
+        """
+        try:
+            index = self.filled_chunks.get_nowait()
+        except queue.Empty:
+            if self.sending:
+                STATS.count("playback_underruns")
+            return self.silence, pyaudio.paContinue
+        data = self.ring[index].tobytes()
+        self.free_chunks.put(index)
+        self.filled_chunks.task_done()
+        return data, pyaudio.paContinue
 
+    @instrument("queue_audio")
+    def queue_audio(self, audio_signal: np.ndarray, flush: bool = False):
+        """
+        Copy an audio signal into the ring, blocking while all chunk buffers are waiting to be played.
+        Parameters:
+            audio_signal (np.ndarray): Numpy array containing the audio signal
+            flush (bool): Pad the last partially filled chunk with silence and queue it
+        """
+        position = 0
+        while position < len(audio_signal) or (flush and self.pending_chunk is not None):
+            if self.pending_chunk is None:
+                self.pending_chunk = self.free_chunks.get()
+                self.pending_fill = 0
+            count = min(self.chunk_size - self.pending_fill, len(audio_signal) - position)
+            self.ring[self.pending_chunk, self.pending_fill:self.pending_fill + count] = audio_signal[position:position + count]
+            self.pending_fill += count
+            position += count
+            if self.pending_fill == self.chunk_size or (flush and position == len(audio_signal)):
+                self.ring[self.pending_chunk, self.pending_fill:] = 0
+                self.filled_chunks.put(self.pending_chunk)
+                self.pending_chunk = None
+        # Once the last chunk is queued, running out of chunks is the end of the message rather than an underrun
+        self.sending = not flush
+
+    def send_symbols(self, symbols, sample_rate: int = 44100, duration: float = 0.3, amplitude: float = 1, phase_continuous: bool = False):
+        """
+        Stream the audio of an iterable of symbols to the default audio output device, synthesizing it while it plays.
+        Returns once the last chunk has been handed to the device; the stream is kept open for the next message.
+        Parameters:
+            symbols (Iterable[int]): Indices into self.frequencies, e.g. the output of change_base
+            sample_rate (int): Sampling rate in Hz
+            duration (float): Duration of each symbol (tone and separator) in seconds
+            amplitude (float): Amplitude of the wave
+            phase_continuous (bool): Join consecutive tones without a phase jump
+        """
+        self.open_output_stream(sample_rate)
+        for audio_signal in self.synthesize_lazily(symbols, sample_rate, duration, amplitude, phase_continuous):
+            self.queue_audio(audio_signal)
+        self.queue_audio(np.zeros(0, dtype=np.float32), flush=True)
+        self.filled_chunks.join()
 
     def send_audio(self, audio_signal: np.ndarray, sample_rate: int = 44100):
         """
         Send an audio signal to the default audio output device.
+        The output stream is kept open between calls, see close().
         Parameters:
             audio_signal (np.ndarray): Numpy array containing the audio signal
             sample_rate (int): Sampling rate in Hz
         """
+        self.open_output_stream(sample_rate)
+        self.queue_audio(audio_signal.astype(np.float32, copy=False), flush=True)
+        self.filled_chunks.join()
 
-        audio = pyaudio.PyAudio()
-        
-        stream = audio.open(format=pyaudio.paFloat32,
-                            channels=1,
-                            rate=sample_rate,
-                            output=True)
-        
+    def save_audio(self, audio_signal: np.ndarray, path: str, sample_rate: int = 44100):
+        """
+        Write an audio signal to a float32 WAV file instead of playing it.
+        Parameters:
+            audio_signal (np.ndarray): Numpy array containing the audio signal
+            path (str): Path of the WAV file to write
+            sample_rate (int): Sampling rate in Hz
+        """
+        wavfile.write(path, sample_rate, audio_signal.astype(np.float32, copy=False))
 
-        stream.write(audio_signal.astype(np.float32).tobytes())
-        stream.stop_stream()
-        stream.close()
-        audio.terminate()
\ No newline at end of file
+    @instrument("device_close")
+    def close(self):
+        """
+        Stop the output stream and release the audio device.
+        """
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.audio.terminate()
+        self.stream = None
+        self.audio = None
@@ -0,0 +1,188 @@
+import contextlib
+import functools
+import json
+import math
+import time
+
+class Histogram:
+    """
+    Latency histogram with one bucket per power of two microseconds, cheap enough to update on every window.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        bucket = int(seconds * 1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "Histogram"):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float)-> float:
+        """
+        Upper bound of the bucket holding the q-quantile, in seconds.
+        """
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min((1 << bucket) * 1e-6, self.max)
+        return self.max
+
+    def to_dict(self)-> dict:
+        return {"count": self.count, "total_ms": 1e3*self.total, "mean_ms": 1e3*self.total/max(self.count, 1),
+                "p50_ms": 1e3*self.quantile(0.5), "p90_ms": 1e3*self.quantile(0.9), "p99_ms": 1e3*self.quantile(0.99),
+                "max_ms": 1e3*self.max, "buckets_us": {f"<{1 << bucket}": count for bucket, count in sorted(self.buckets.items())}}
+
+
+class Summary:
+    """
+    Count, mean, minimum and maximum of an observed value.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Summary"):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self)-> dict:
+        return {"count": self.count, "mean": self.total/self.count, "min": self.min, "max": self.max}
+
+
+class Stats:
+    """
+    Per-stage latency histograms, counters and observed values of the sender, the receiver and the decoders.
+    The modules report into the shared STATS object; while it is disabled every hook returns at its first statement
+    (stage hands out one shared no-op context manager), so instrumented code runs at full speed.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything recorded so far.
+        """
+        self.stages = {}
+        self.counters = {}
+        self.values = {}
+        self.started = time.time()
+
+    def stage(self, name: str):
+        """
+        Context manager adding the wall clock time spent in its body to the latency histogram of a stage.
+        """
+        if not self.enabled:
+            return DISABLED
+        return self.timer(name)
+
+    @contextlib.contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if name not in self.stages:
+                self.stages[name] = Histogram()
+            self.stages[name].add(elapsed)
+
+    def count(self, name: str, amount: int = 1):
+        """
+        Add to a counter.
+        """
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float, key = None):
+        """
+        Record a value, e.g. the SNR of a symbol, optionally under a key such as the frequency of its band.
+        """
+        if not self.enabled:
+            return
+        summaries = self.values.setdefault(name, {})
+        if key not in summaries:
+            summaries[key] = Summary()
+        summaries[key].add(float(value))
+
+    def merge(self, other: "Stats"):
+        """
+        Add the statistics recorded by another Stats object, e.g. in a worker process.
+        """
+        for name, histogram in other.stages.items():
+            self.stages.setdefault(name, Histogram()).merge(histogram)
+        for name, amount in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + amount
+        for name, summaries in other.values.items():
+            for key, summary in summaries.items():
+                self.values.setdefault(name, {}).setdefault(key, Summary()).merge(summary)
+
+    def to_dict(self)-> dict:
+        """
+        Everything recorded, as plain JSON serialisable types.
+        """
+        return {"seconds": time.time() - self.started,
+                "stages": {name: histogram.to_dict() for name, histogram in sorted(self.stages.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "values": {name: (summaries[None].to_dict() if list(summaries) == [None] else
+                                  {str(key): summary.to_dict() for key, summary in sorted(summaries.items())})
+                           for name, summaries in sorted(self.values.items())}}
+
+    def save(self, path: str = None):
+        """
+        Write the statistics as JSON to a file, or to stdout without a path.
+        """
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is None:
+            print(text)
+            return
+        with open(path, "w") as file:
+            file.write(text + "\n")
+
+
+DISABLED = contextlib.nullcontext()
+
+# Shared by every module, enabled by main.py --stats
+STATS = Stats()
+
+
+def instrument(name: str):
+    """
+    Decorator timing every call of a function as a stage of STATS.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not STATS.enabled:
+                return function(*args, **kwargs)
+            with STATS.timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,145 @@
+import numpy as np
+
+class CorrelationSync:
+    """
+    Matched filter for the special sequence, locating its end to the sample.
+    Every segment of the sequence is correlated against a complex exponential at its tone frequency, so the detector is
+    insensitive to the carrier phase and to small clock drift. A lag scores the energy of the expected tone of every
+    segment minus the strongest other sync tone, which suppresses the lags shifted by whole segments that a plain
+    correlation of the repetitive sequence would also match. Guard tones just outside the band plan only count towards
+    the energy the score is compared with, so the leakage of another sender in a neighbouring band plan, which reaches
+    the guard tones at least as strongly as the sync tones, is not mistaken for the sequence.
+    The search runs on blocks of segment_length/32 samples, keeping only the running DFT sums of every block, and the
+    confirmed peak is refined to the sample from the raw samples around it.
+    """
+
+    def __init__(self, frequencies, segment_length: int, sample_rate: int = 44100, threshold: float = 0.5, guards = ()):
+        """
+        Parameters:
+            frequencies (list[float]): Tone frequency of every segment of the special sequence, in Hz
+            segment_length (int): Number of samples of each segment
+            sample_rate (int): Sampling rate in Hz
+            threshold (float): Minimum score, relative to the energy of the sync and guard tones in the window, for the sequence to be present
+            guards (list[float]): Frequencies in Hz whose energy only counts towards that of the window
+        """
+        self.tones, self.segment_tones = np.unique(np.asarray(frequencies, dtype=float), return_inverse=True)
+        self.omegas = 2 * np.pi * np.concatenate((self.tones, np.asarray(guards, dtype=float))) / sample_rate
+        self.segment_length = segment_length
+        self.length = segment_length * len(frequencies)
+        self.threshold = threshold
+        self.blocks = min(32, segment_length)
+        self.step = segment_length // self.blocks
+        self.confirm = int(2.5 * segment_length) // self.step
+        self.reset()
+
+    def reset(self):
+        """
+        Forget every sample seen so far.
+        """
+        self.total = 0
+        self.chunks = []
+        self.chunk_origin = 0
+        self.partial = np.zeros(0)
+        self.block_origin = 0
+        self.prefix = np.zeros((len(self.omegas), 1), dtype=complex)
+        self.score = np.zeros(0)
+        self.presence = np.zeros(0)
+
+    def scores(self, prefix: np.ndarray, lags: np.ndarray, segment: int):
+        """
+        Score positions as the start of the special sequence.
+
+        Parameters:
+            prefix (np.ndarray): (tones, n+1) running sums of the samples rotated by every sync tone, then every guard tone
+            lags (np.ndarray): Positions to score, indices into the running sums
+            segment (int): Length of a segment in indices of the running sums
+
+        Returns:
+            score (np.ndarray): Energy of the expected tones minus the strongest other sync tone, summed over segments
+            presence (np.ndarray): The score relative to the energy of all sync and guard tones over the window, close to
+                1 for a clean sequence and negative on average for noise, whatever the noise outside these tones
+        """
+        score, total = np.zeros(len(lags)), np.zeros(len(lags))
+        for j, tone in enumerate(self.segment_tones):
+            positions = lags + j*segment
+            power = np.abs(prefix[:, positions + segment] - prefix[:, positions])**2
+            total += np.sum(power, axis=0)
+            expected = power[tone].copy()
+            power[tone] = 0
+            score += expected - np.max(power[:len(self.tones)], axis=0)
+        return score, score / (total + 1e-12)
+
+    def feed(self, samples: np.ndarray):
+        """
+        Append samples and look for the special sequence.
+        Lags are scored on the block grid; once a peak was confirmed by the following lags it is refined to the sample.
+
+        Parameters:
+            samples (np.ndarray): Next samples of the stream
+
+        Returns:
+            np.ndarray: The samples following the special sequence once it was found, None otherwise
+        """
+        x = np.asarray(samples, dtype=np.float64)
+        self.chunks.append(x)
+        self.total += len(x)
+        pending = np.concatenate((self.partial, x))
+        count = len(pending) // self.step
+        self.partial = pending[count*self.step:]
+        if count > 0:
+            blocks = pending[:count*self.step].reshape(count, self.step)
+            start = self.total - len(self.partial) - count*self.step
+            t = np.arange(start, start + count*self.step).reshape(count, self.step)
+            rotated = np.einsum('bs,kbs->kb', blocks, np.exp(-1j * self.omegas[:, None, None] * t))
+            self.prefix = np.concatenate((self.prefix, self.prefix[:, -1:] + np.cumsum(rotated, axis=1)), axis=1)
+
+        lags = np.arange(len(self.score), self.prefix.shape[1] - self.blocks*len(self.segment_tones))
+        if len(lags) > 0:
+            score, presence = self.scores(self.prefix, lags, self.blocks)
+            self.score = np.concatenate((self.score, score))
+            self.presence = np.concatenate((self.presence, presence))
+
+        candidates = np.flatnonzero(self.presence >= self.threshold)
+        if len(candidates) == 0:
+            self.trim(len(self.score))
+            return None
+        peak = candidates[np.argmax(self.score[candidates])]
+        if len(self.score) - 1 - peak < self.confirm:
+            self.trim(candidates[0])
+            return None
+        return self.refine(self.block_origin + peak*self.step)
+
+    def refine(self, lag: int)-> np.ndarray:
+        """
+        Find the start of the sequence to the sample within a block of the coarse lag.
+
+        Parameters:
+            lag (int): Stream position of the coarse peak
+
+        Returns:
+            np.ndarray: The samples following the special sequence
+        """
+        buffer = np.concatenate(self.chunks)
+        first = max(lag - self.step, self.chunk_origin)
+        span = buffer[first - self.chunk_origin:lag + self.step + self.length - self.chunk_origin]
+        t = np.arange(first, first + len(span))
+        prefix = np.zeros((len(self.omegas), len(span) + 1), dtype=complex)
+        prefix[:, 1:] = np.cumsum(span * np.exp(-1j * self.omegas[:, None] * t), axis=1)
+        lags = np.arange(min(2*self.step, len(span) - self.length) + 1)
+        best = first + lags[np.argmax(self.scores(prefix, lags, self.segment_length)[0])]
+        remaining = buffer[best + self.length - self.chunk_origin:]
+        self.reset()
+        return remaining
+
+    def trim(self, keep: int):
+        """
+        Drop the scored lags before index `keep` and the samples only they needed.
+        """
+        if keep <= 0:
+            return
+        self.score = self.score[keep:]
+        self.presence = self.presence[keep:]
+        self.prefix = self.prefix[:, keep:]
+        self.block_origin += keep*self.step
+        while len(self.chunks) > 1 and self.chunk_origin + len(self.chunks[0]) < self.block_origin - self.step:
+            self.chunk_origin += len(self.chunks.pop(0))